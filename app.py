@@ -1,10 +1,24 @@
 import os
+import hashlib
+import sys
+import time
 import logging
+import sqlite3
+import subprocess
 from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, jsonify, flash, session
-from models import db, AcademicYear, Class, Student, Chapter, ChapterDependency, Grade
-from services import get_recommendations, initialize_sample_data, initialize_indonesian_sample_data, evaluate_model_accuracy, ensure_all_students_have_grades
+import click
+from flask import Flask, Response, render_template, request, redirect, url_for, jsonify, flash, stream_with_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import joinedload, selectinload
+from models import db, AcademicYear, Class, Student, Chapter, ChapterDependency, Grade, ClassChapterStats
+from services import get_class_recommendations, get_class_grades, initialize_sample_data, initialize_indonesian_sample_data, get_model_evaluation, ensure_all_students_have_grades, invalidate_model_cache, invalidate_dependency_graph, get_chapter_graph, get_class_data_version, get_recommendation_table, RECOMMENDATION_SORTS, commit_grade_changes, begin_grade_write, upsert_grades, update_class_chapter_stats, rebuild_class_chapter_stats, check_class_chapter_stats
 import utils
+import instrumentation
+from grade_import import import_grades, to_stored_score, SCORE_DECIMALS
+from grade_export import iter_grade_rows, iter_recommendation_rows, stream_csv, stream_xlsx, RECOMMENDATION_SHEET_NAME, SHEET_NAME
+
+_boot_started = time.perf_counter()
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -13,13 +27,43 @@ logging.basicConfig(level=logging.DEBUG)
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key")
 
-# Initialize in-memory database
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+# Use DATABASE_URL when set so every worker shares one store,
+# otherwise fall back to a file-backed SQLite database in the instance folder
+database_url = os.environ.get("DATABASE_URL", "sqlite:///edutrack.db")
+if database_url.startswith("postgres://"):
+    database_url = database_url.replace("postgres://", "postgresql://", 1)
+app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_pre_ping": True}
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 db.init_app(app)
+instrumentation.init_app(app)
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    """Enable WAL so concurrent workers can read while another one writes"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+# Booting the app does no database work: tables are created with
+# `flask init-db` and sample data is loaded with `flask seed`
+@app.cli.command("init-db")
+def init_db_command():
+    """Create any missing database tables."""
+    db.create_all()
+    # Databases created before ClassChapterStats existed get it filled once
+    if Grade.query.first() and not ClassChapterStats.query.first():
+        rebuild_class_chapter_stats()
+        print("Class chapter statistics built")
+    print("Database tables created")
 
-# Create tables and load initial data
-with app.app_context():
+@app.cli.command("seed")
+def seed_command():
+    """Create the tables and load the sample chapters, classes, students and grades."""
     db.create_all()
     # Initialize sample chapter dependencies structure
     initialize_sample_data()
@@ -27,8 +71,73 @@ with app.app_context():
     initialize_indonesian_sample_data()
     # Ensure all students have grades for all chapters
     num_students_updated = ensure_all_students_have_grades()
+    rebuild_class_chapter_stats()
+    invalidate_model_cache()
     print(f"Updated {num_students_updated} students to ensure all have grades for all chapters")
+
+@app.cli.command("import-grades")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--year-id", type=int, default=None, help="Academic year for classes that do not exist yet.")
+def import_grades_command(path, year_id):
+    """Import a grade sheet in the template_dataset_nilai_matematika.xlsx layout."""
+    started = time.perf_counter()
+    with open(path, "rb") as stream:
+        summary = import_grades(stream, path, academic_year_id=year_id)
+    print(f"Imported {summary['rows']} rows in {time.perf_counter() - started:.2f}s: "
+          f"{summary['grades_inserted']} grades inserted, {summary['grades_updated']} updated, "
+          f"{summary['students_created']} students and {summary['classes_created']} classes created, "
+          f"{summary['invalid_scores']} invalid scores, {summary['skipped_rows']} rows skipped")
+    if summary['unknown_columns']:
+        print(f"Ignored unknown columns: {', '.join(summary['unknown_columns'])}")
+
+@app.cli.command("rebuild-stats")
+@click.option("--check-only", is_flag=True, help="Only report differences, do not rebuild.")
+def rebuild_stats_command(check_only):
+    """Check ClassChapterStats against the grades and rebuild it from scratch."""
+    mismatches = check_class_chapter_stats()
+    for mismatch in mismatches[:20]:
+        print(f"class {mismatch['class_id']} chapter {mismatch['chapter_id']} {mismatch['column']}: "
+              f"stored {mismatch['stored']}, expected {mismatch['expected']}")
+    if len(mismatches) > 20:
+        print(f"... {len(mismatches) - 20} more")
+    print(f"{len(mismatches)} differences found")
     
+    if check_only:
+        if mismatches:
+            sys.exit(1)
+        return
+    rebuild_class_chapter_stats()
+    print("Class chapter statistics rebuilt")
+
+@app.cli.command("check-boot")
+@click.option("--budget", type=float, default=lambda: get_boot_budget(),
+              help="Maximum allowed cold start in seconds.")
+@click.option("--runs", type=int, default=3, help="Number of fresh interpreters to time.")
+def check_boot_command(budget, runs):
+    """Time a cold import of the app in fresh interpreters and fail if it exceeds the budget."""
+    timings = measure_cold_import(runs)
+    worst = max(timings)
+    print(f"Cold start: best {min(timings):.3f}s, worst {worst:.3f}s (budget {budget:.3f}s)")
+    if worst > budget:
+        raise SystemExit(1)
+
+def get_boot_budget():
+    """Maximum cold start in seconds (EDUTRACK_BOOT_BUDGET, default 2)"""
+    return float(os.environ.get("EDUTRACK_BOOT_BUDGET", 2.0))
+
+def measure_cold_import(runs=3):
+    """Seconds taken by `import app` in each of runs fresh interpreters"""
+    script = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
 # Add global template context
 @app.context_processor
 def inject_now():
@@ -45,27 +154,14 @@ def dashboard():
     
     selected_class_id = request.args.get('class_id', None)
     
-    class_data = None
-    students = []
-    chapters = []
-    performance_data = {}
-    
-    if selected_class_id:
-        class_data = Class.query.get(selected_class_id)
-        if class_data:
-            students = Student.query.filter_by(class_id=selected_class_id).all()
-            chapters = Chapter.query.all()
-            
-            # Prepare performance data for visualization
-            performance_data = utils.prepare_performance_data(students, chapters)
+    # Charts are loaded by dashboard.js from /api/performance_data, which the
+    # browser revalidates with its ETag instead of recomputing on every view
+    class_data = Class.query.get(selected_class_id) if selected_class_id else None
     
     return render_template('dashboard.html', 
                            years=years, 
                            classes=classes, 
-                           selected_class=class_data,
-                           students=students,
-                           chapters=chapters,
-                           performance_data=performance_data)
+                           selected_class=class_data)
 
 @app.route('/classes', methods=['GET', 'POST'])
 def classes():
@@ -91,7 +187,8 @@ def classes():
             else:
                 flash('Class name and academic year must be provided', 'danger')
     
-    years = AcademicYear.query.all()
+    # The year table shows each year's class count
+    years = AcademicYear.query.options(selectinload(AcademicYear.classes)).all()
     classes = Class.query.all()
     return render_template('classes.html', years=years, classes=classes)
 
@@ -109,15 +206,24 @@ def students():
             else:
                 flash('Student name and class must be provided', 'danger')
 
-    classes = Class.query.all()
+    classes = Class.query.options(joinedload(Class.academic_year)).all()
     selected_class_id = request.args.get('class_id')
     
     if selected_class_id:
         students_list = Student.query.filter_by(class_id=selected_class_id).all()
         selected_class = Class.query.get(selected_class_id)
+        # {student_id: {chapter_id: score}} so the grid does O(1) lookups
+        grades = get_class_grades(selected_class_id)
     else:
         students_list = []
         selected_class = None
+        grades = {}
+    
+    # Average score per student on the 0-1 scale
+    average_scores = {
+        student_id: sum(scores.values()) / len(scores)
+        for student_id, scores in grades.items() if scores
+    }
         
     chapters = Chapter.query.all()
     return render_template('students.html', 
@@ -125,7 +231,8 @@ def students():
                            students=students_list,
                            selected_class=selected_class,
                            chapters=chapters,
-                           Chapter=Chapter)
+                           grades=grades,
+                           average_scores=average_scores)
 
 @app.route('/chapters', methods=['GET', 'POST'])
 def chapters():
@@ -150,20 +257,26 @@ def chapters():
                     dependency_id=dependency_id
                 ).first()
                 
-                if not existing:
+                if existing:
+                    flash('This dependency already exists', 'warning')
+                elif get_chapter_graph().would_create_cycle(int(chapter_id), int(dependency_id)):
+                    flash('Dependency rejected: it would create a prerequisite cycle', 'danger')
+                else:
                     dependency = ChapterDependency(
                         chapter_id=chapter_id,
                         dependency_id=dependency_id
                     )
                     db.session.add(dependency)
                     db.session.commit()
+                    invalidate_dependency_graph()
+                    invalidate_model_cache()
                     flash('Dependency added successfully', 'success')
-                else:
-                    flash('This dependency already exists', 'warning')
             else:
                 flash('Please select different chapters for dependency', 'danger')
     
-    chapters_list = Chapter.query.all()
+    # Prerequisites of every chapter in one query; dependency_of resolves
+    # from the identity map since all chapters are loaded
+    chapters_list = Chapter.query.options(selectinload(Chapter.dependencies)).all()
     dependencies = ChapterDependency.query.all()
     
     # Create a dependency mapping for the frontend
@@ -184,83 +297,324 @@ def update_grades():
     chapter_id = request.form.get('chapter_id')
     score = request.form.get('score')
     
+    class_id = None
     if student_id and chapter_id and score:
         try:
-            score = float(score)
+            student_id, chapter_id, score = int(student_id), int(chapter_id), float(score)
+        except ValueError:
+            flash('Informasi yang diperlukan tidak lengkap atau tidak valid', 'danger')
+        else:
+            # Unknown ids would otherwise fail the foreign keys on commit
+            student = db.session.get(Student, student_id)
+            # Read before the commit below expires the loaded student
+            class_id = student.class_id if student else None
+            if student is None:
+                flash('Siswa tidak ditemukan', 'danger')
+            elif db.session.get(Chapter, chapter_id) is None:
+                flash('Bab tidak ditemukan', 'danger')
             # Convert score to 0-1 scale if it's in 0-100 scale
-            if 0 <= score <= 100:
+            elif 0 <= score <= 100:
                 if score > 1:  # If score is in 0-100 range, convert to 0-1
-                    score = score / 100.0
+                    score = to_stored_score(score)
+                else:
+                    score = round(score, SCORE_DECIMALS)
                 
+                # Taken before the old score is read: a concurrent writer of
+                # the same grade waits, so the stats delta starts from its score
+                revision = begin_grade_write()
                 # Check if grade exists
                 grade = Grade.query.filter_by(
                     student_id=student_id,
                     chapter_id=chapter_id
-                ).first()
+                ).with_for_update().first()
                 
+                old_score = grade.score if grade else None
                 if grade:
                     grade.score = score
+                    grade.revision = revision
                 else:
-                    grade = Grade(student_id=student_id, chapter_id=chapter_id, score=score)
+                    grade = Grade(student_id=student_id, chapter_id=chapter_id, score=score, revision=revision)
                     db.session.add(grade)
                 
-                db.session.commit()
+                update_class_chapter_stats([(student_id, chapter_id, old_score, score)])
+                commit_grade_changes([(student_id, chapter_id, score)])
                 flash('Nilai berhasil diperbarui', 'success')
             else:
                 flash('Nilai harus antara 0 dan 100', 'danger')
-        except ValueError:
-            flash('Nilai harus berupa angka yang valid', 'danger')
     else:
         flash('Informasi yang diperlukan tidak lengkap', 'danger')
     
-    # Get the student and extract class_id if it exists
-    student = Student.query.get(student_id) if student_id else None
-    if student:
-        return redirect(url_for('students', class_id=student.class_id))
+    if class_id:
+        return redirect(url_for('students', class_id=class_id))
     return redirect(url_for('students'))
 
+@app.route('/api/grades/batch', methods=['POST'])
+def api_grades_batch():
+    """Apply many grade edits in one transaction and report a status per row"""
+    rows = request.get_json(silent=True)
+    if isinstance(rows, dict):
+        rows = rows.get('grades')
+    if not isinstance(rows, list):
+        return jsonify({'error': 'Body must be a JSON array of {student_id, chapter_id, score}'}), 400
+    
+    results = []
+    valid_rows = []
+    for index, row in enumerate(rows):
+        result = {'index': index}
+        results.append(result)
+        try:
+            student_id = int(row['student_id'])
+            chapter_id = int(row['chapter_id'])
+            score = float(row['score'])
+        except (TypeError, KeyError, ValueError):
+            result.update(status='error', message='Informasi yang diperlukan tidak lengkap atau tidak valid')
+            continue
+        
+        result.update(student_id=student_id, chapter_id=chapter_id)
+        if not 0 <= score <= 100:
+            result.update(status='error', message='Nilai harus antara 0 dan 100')
+            continue
+        
+        # Convert score to 0-1 scale if it's in 0-100 scale
+        if score > 1:
+            score = to_stored_score(score)
+        else:
+            score = round(score, SCORE_DECIMALS)
+        result['score'] = score
+        valid_rows.append((result, {'student_id': student_id, 'chapter_id': chapter_id, 'score': score}))
+    
+    if valid_rows:
+        student_ids = {row['student_id'] for _, row in valid_rows}
+        chapter_ids = {row['chapter_id'] for _, row in valid_rows}
+        known_students = {student_id for (student_id,) in
+                          db.session.query(Student.id).filter(Student.id.in_(student_ids))}
+        known_chapters = {chapter_id for (chapter_id,) in
+                          db.session.query(Chapter.id).filter(Chapter.id.in_(chapter_ids))}
+        # Before reading the old scores the stats deltas start from, see update_grades
+        revision = begin_grade_write()
+        existing = {
+            (student_id, chapter_id): score for student_id, chapter_id, score in db.session.query(
+                Grade.student_id, Grade.chapter_id, Grade.score
+            ).filter(Grade.student_id.in_(student_ids), Grade.chapter_id.in_(chapter_ids)).with_for_update()
+        }
+        
+        # Later edits of the same cell win
+        to_write = {}
+        for result, row in valid_rows:
+            if row['student_id'] not in known_students:
+                result.update(status='error', message='Siswa tidak ditemukan')
+            elif row['chapter_id'] not in known_chapters:
+                result.update(status='error', message='Bab tidak ditemukan')
+            else:
+                key = (row['student_id'], row['chapter_id'])
+                result['status'] = 'updated' if key in existing else 'inserted'
+                to_write[key] = row
+        
+        try:
+            upsert_grades(list(to_write.values()), revision)
+            update_class_chapter_stats(
+                (key[0], key[1], existing.get(key), row['score']) for key, row in to_write.items()
+            )
+            commit_grade_changes(
+                (row['student_id'], row['chapter_id'], row['score']) for row in to_write.values()
+            )
+        except Exception as e:
+            db.session.rollback()
+            logging.exception("Batch grade update failed")
+            # The whole batch was rolled back, so no row was saved
+            for result in results:
+                if result.get('status') in ('inserted', 'updated'):
+                    result.update(status='error', message='Nilai tidak disimpan karena batch gagal')
+            return jsonify({'error': str(e), 'saved': 0, 'failed': len(results), 'results': results}), 500
+    
+    saved = sum(1 for result in results if result.get('status') in ('inserted', 'updated'))
+    return jsonify({'saved': saved, 'failed': len(results) - saved, 'results': results})
+
+@app.route('/grades/import', methods=['POST'])
+def import_grades_file():
+    upload = request.files.get('grades_file')
+    class_id = request.form.get('class_id')
+    year_id = request.form.get('year_id')
+    
+    if not upload or not upload.filename:
+        flash('Pilih file nilai (.xlsx atau .csv) terlebih dahulu', 'danger')
+    elif os.path.splitext(upload.filename)[1].lower() not in ('.xlsx', '.csv'):
+        flash('Format file harus .xlsx atau .csv', 'danger')
+    else:
+        try:
+            summary = import_grades(upload.stream, upload.filename, academic_year_id=year_id)
+            flash(f"{summary['grades_inserted'] + summary['grades_updated']} nilai berhasil diimpor "
+                  f"({summary['students_created']} siswa baru, {summary['invalid_scores']} nilai tidak valid)",
+                  'success')
+            if summary['unknown_columns']:
+                flash(f"Kolom tidak dikenal diabaikan: {', '.join(summary['unknown_columns'])}", 'warning')
+        except Exception as e:
+            logging.exception("Grade import failed")
+            flash(f'Gagal mengimpor file: {e}', 'danger')
+    
+    if class_id:
+        return redirect(url_for('students', class_id=class_id))
+    return redirect(url_for('students'))
+
+def _export_response(rows, basename, sheet_name):
+    """Stream export rows as CSV (default) or xlsx depending on ?format="""
+    class_id = request.args.get('class_id', type=int)
+    year_id = request.args.get('academic_year_id', type=int)
+    if class_id:
+        basename += f'_kelas_{class_id}'
+    elif year_id:
+        basename += f'_tahun_{year_id}'
+    
+    if request.args.get('format') == 'xlsx':
+        return Response(stream_with_context(stream_xlsx(rows, sheet_name)),
+                        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                        headers={'Content-Disposition': f'attachment; filename={basename}.xlsx'})
+    return Response(stream_with_context(stream_csv(rows)),
+                    mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={basename}.csv'})
+
+@app.route('/export/grades')
+def export_grades():
+    if request.args.get('format', 'csv') not in ('csv', 'xlsx'):
+        return jsonify({'error': 'Format must be csv or xlsx'}), 400
+    rows = iter_grade_rows(class_id=request.args.get('class_id', type=int),
+                           academic_year_id=request.args.get('academic_year_id', type=int))
+    return _export_response(rows, 'nilai', SHEET_NAME)
+
+@app.route('/export/recommendations')
+def export_recommendations():
+    if request.args.get('format', 'csv') not in ('csv', 'xlsx'):
+        return jsonify({'error': 'Format must be csv or xlsx'}), 400
+    rows = iter_recommendation_rows(class_id=request.args.get('class_id', type=int),
+                                    academic_year_id=request.args.get('academic_year_id', type=int))
+    return _export_response(rows, 'rekomendasi', RECOMMENDATION_SHEET_NAME)
+
 @app.route('/recommendations')
 def recommendations():
-    class_id = request.args.get('class_id')
+    class_id = request.args.get('class_id', type=int)
     if not class_id:
         flash('Please select a class', 'warning')
         return redirect(url_for('dashboard'))
     
+    # The table and summary are paged in by recommendations.js
+    # from /api/recommendations/page
     class_obj = Class.query.get(class_id)
-    students = Student.query.filter_by(class_id=class_id).all()
-    chapters = Chapter.query.all()
-    
-    # Get recommendations for all students in the class
-    recommendations_data = {}
-    for student in students:
-        student_recommendations = get_recommendations(student.id)
-        recommendations_data[student.id] = student_recommendations
+    chapters = Chapter.query.order_by(Chapter.id).all()
     
     return render_template('recommendations.html',
                            class_obj=class_obj,
-                           students=students,
-                           chapters=chapters,
-                           recommendations=recommendations_data)
+                           classes=Class.query.options(joinedload(Class.academic_year)).all(),
+                           chapters=chapters)
 
 @app.route('/api/performance_data')
 def api_performance_data():
-    class_id = request.args.get('class_id')
+    class_id = request.args.get('class_id', type=int)
     if not class_id:
         return jsonify({'error': 'No class selected'}), 400
     
-    students = Student.query.filter_by(class_id=class_id).all()
-    chapters = Chapter.query.all()
+    # Answer repeat requests from the stamp alone while the class is unchanged
+    etag = hashlib.sha1(get_class_data_version(class_id).encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        class_data = Class.query.get(class_id)
+        if not class_data:
+            return jsonify({'error': 'Class not found'}), 404
+        
+        students = Student.query.filter_by(class_id=class_id).order_by(Student.id).all()
+        chapters = Chapter.query.order_by(Chapter.id).all()
+        
+        performance_data = utils.prepare_performance_data(students, chapters)
+        performance_data['class'] = {
+            'id': class_data.id,
+            'name': class_data.name,
+            'academic_year': class_data.academic_year.name,
+            'student_count': len(students)
+        }
+        response = jsonify(performance_data)
+    
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/api/analytics')
+def api_analytics():
+    """Per-chapter statistics per class, per academic year or for the whole school"""
+    level = request.args.get('level', 'year')
+    if level not in utils.AGGREGATE_LEVELS:
+        return jsonify({'error': f"Unknown level '{level}'"}), 400
     
-    performance_data = utils.prepare_performance_data(students, chapters)
-    return jsonify(performance_data)
+    return jsonify(utils.get_aggregate_performance(level, request.args.get('academic_year_id', type=int)))
+
+@app.route('/api/recommendations')
+def api_recommendations():
+    if not request.args.get('class_id'):
+        return jsonify({'error': 'No class selected'}), 400
+    # Model partitions are looked up by the integer class id
+    class_id = request.args.get('class_id', type=int)
+    if class_id is None:
+        return jsonify({'error': 'Invalid class_id'}), 400
+    
+    recommendations_data = get_class_recommendations(class_id)
+    return jsonify({
+        str(student_id): {str(chapter_id): category for chapter_id, category in chapters.items()}
+        for student_id, chapters in recommendations_data.items()
+    })
+
+@app.route('/api/recommendations/page')
+def api_recommendations_page():
+    """One page of the batch recommendations of a class, or of the whole school"""
+    class_id = request.args.get('class_id', type=int)
+    chapter_id = request.args.get('chapter_id', type=int)
+    sort = request.args.get('sort', 'student')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+    if sort not in RECOMMENDATION_SORTS:
+        return jsonify({'error': f"Unknown sort '{sort}'"}), 400
+    
+    table = get_recommendation_table(class_id)
+    total, rows = table.page(category=request.args.get('category') or None,
+                             chapter_id=chapter_id,
+                             student_prefix=request.args.get('student', '').strip(),
+                             sort=sort,
+                             page=page,
+                             per_page=per_page)
+    return jsonify({
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page,
+        'rows': rows,
+        'summary': table.summary()
+    })
 
 @app.route('/model-accuracy')
 def model_accuracy():
-    # Evaluate the model and get accuracy metrics
-    accuracy_data = evaluate_model_accuracy()
+    # Serve the last evaluation; a stale one is recomputed in the background
+    evaluation = get_model_evaluation()
     
     return render_template('model_accuracy.html', 
-                           accuracy_data=accuracy_data)
+                           accuracy_data=evaluation['result'],
+                           evaluation=evaluation)
+
+@app.route('/model-accuracy/refresh', methods=['POST'])
+def refresh_model_accuracy():
+    get_model_evaluation(refresh=True)
+    flash('Evaluasi model sedang dihitung ulang', 'info')
+    return redirect(url_for('model_accuracy'))
+
+@app.route('/api/model-accuracy')
+def api_model_accuracy():
+    evaluation = get_model_evaluation()
+    return jsonify({
+        'running': evaluation['running'],
+        'stale': evaluation['stale'],
+        'computed_at': evaluation['computed_at'].isoformat() if evaluation['computed_at'] else None,
+        'result': evaluation['result']
+    })
+
+app.config["BOOT_SECONDS"] = time.perf_counter() - _boot_started
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,86 @@
+"""Render time of the students grid and the paged recommendations table.
+
+/recommendations only renders the page shell; its table is built as a
+RecommendationTable and paged in from /api/recommendations/page, so
+those two are timed instead.
+
+Usage::
+
+    python -m benchmarks.bench_grade_grid
+
+Drops and reseeds the database, so it runs against a temporary SQLite
+file unless DATABASE_URL is set, and refuses any other database unless
+--allow-real-database is passed.
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{tempfile.mkdtemp(prefix='edutrack-bench-grid-')}/edutrack.db")
+os.environ.setdefault('EDUTRACK_MODEL_DIR', tempfile.mkdtemp(prefix='edutrack-bench-models-'))
+os.environ.setdefault('EDUTRACK_RETRAIN_DELAY', '3600')
+
+from app import app
+from services import get_recommendation_table, invalidate_recommendation_tables
+from benchmarks.synthetic import reset_database, create_school, refuse_real_database
+
+SIZES = [(40, 14), (500, 50)]
+REPEAT = 5
+
+
+def best_ms(func):
+    """Best-of-REPEAT wall time of func() in milliseconds"""
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def time_get(client, url):
+    """Best-of-REPEAT wall time of a GET request in milliseconds"""
+    def get():
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+    return best_ms(get)
+
+
+def time_table_build(class_id):
+    """Best-of-REPEAT time to build the class's RecommendationTable from a warm model and matrix"""
+    def build():
+        invalidate_recommendation_tables()
+        get_recommendation_table(class_id)
+    with app.app_context():
+        get_recommendation_table(class_id)
+        return best_ms(build)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--allow-real-database', action='store_true',
+                        help="drop and reseed DATABASE_URL even if it is not a throwaway database")
+    args = parser.parse_args(argv)
+
+    refuse_real_database(app.config['SQLALCHEMY_DATABASE_URI'], args.allow_real_database)
+
+    logging.disable(logging.INFO)
+    client = app.test_client()
+    print(f"{'class':>10} {'target':<28} {'best ms':>10}")
+    for num_students, num_chapters in SIZES:
+        with app.app_context():
+            reset_database()
+            class_id, = create_school(students_per_class=num_students, num_chapters=num_chapters)
+        timings = [
+            ('/students', time_get(client, f"/students?class_id={class_id}")),
+            ('RecommendationTable build', time_table_build(class_id)),
+            ('/api/recommendations/page', time_get(client, f"/api/recommendations/page?class_id={class_id}")),
+        ]
+        for target, elapsed in timings:
+            print(f"{num_students:>4}x{num_chapters:<5} {target:<28} {elapsed:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
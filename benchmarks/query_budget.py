@@ -0,0 +1,179 @@
+"""Query budget guard: catches routes that issue per-row (N+1) queries.
+
+Every route is rendered against a small and a large synthetic school and
+the SQL statements it issues are recorded. A route fails when its count
+changes with the school size or exceeds its entry in QUERY_BUDGETS::
+
+    python -m benchmarks.query_budget
+
+Exits 1 on failure and prints the repeated statements of the failing
+routes. Runs against an in-memory SQLite database unless DATABASE_URL is
+set, and refuses anything but a throwaway SQLite database unless
+--allow-real-database is passed; a new route has to be given a budget
+before the guard passes. tests/test_query_budget.py runs the same check
+under pytest.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+os.environ.setdefault('EDUTRACK_MODEL_DIR', tempfile.mkdtemp(prefix='edutrack-budget-models-'))
+os.environ.setdefault('EDUTRACK_RETRAIN_DELAY', '3600')
+
+from sqlalchemy import event
+
+import services
+from app import app
+from benchmarks.run import wait_for_background_work
+from benchmarks.synthetic import reset_database, create_school, refuse_real_database
+from grade_matrix import invalidate_grade_matrix
+from models import db
+
+# (classes, students per class, chapters, academic years) of the schools compared
+SIZES = [(2, 5, 6, 1), (6, 60, 18, 3)]
+
+# Maximum statements per warm request, by endpoint. Raise an entry only
+# together with the change that needs the extra query
+QUERY_BUDGETS = {
+    'index': 0,
+    'dashboard': 3,
+    'classes': 3,
+    'students': 5,
+    'chapters': 3,
+    'recommendations': 3,
+    'api_performance_data': 7,
+    'api_analytics': 5,
+    'api_recommendations': 6,
+    'api_recommendations_page': 2,
+    'model_accuracy': 2,
+    'api_model_accuracy': 2,
+    'export_grades': 2,
+    'export_recommendations': 9,
+    'update_grades': 9,
+    'api_grades_batch': 9,
+}
+SKIPPED_ENDPOINTS = {'static', 'metrics', 'refresh_model_accuracy', 'import_grades_file'}
+
+
+class QueryRecorder:
+    """Collects the statements issued on the recording thread"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.thread = threading.get_ident()
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        # Background refits and evaluations run on other threads
+        if threading.get_ident() == self.thread:
+            self.statements.append(' '.join(statement.split()))
+
+
+def route_requests(class_id, grade):
+    """(endpoint, request callable) for every route, keyed for the budget table"""
+    student_id, chapter_id, score = grade
+    client = app.test_client()
+    requests = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if rule.endpoint in SKIPPED_ENDPOINTS or rule.arguments or 'GET' not in rule.methods:
+            continue
+        requests.append((rule.endpoint, lambda url=f"{rule.rule}?class_id={class_id}": client.get(url)))
+    requests.append(('update_grades', lambda: client.post(
+        '/grades', data={'student_id': student_id, 'chapter_id': chapter_id, 'score': score * 100}
+    )))
+    requests.append(('api_grades_batch', lambda: client.post(
+        '/api/grades/batch', json=[{'student_id': student_id, 'chapter_id': chapter_id, 'score': score * 100}]
+    )))
+    return requests
+
+
+def measure(num_classes, students_per_class, num_chapters, num_years):
+    """Statements issued by a warm request to every route: {endpoint: [statement, ...]}"""
+    # An evaluation started on the previous school must not see this one half built
+    wait_for_background_work()
+    with app.app_context():
+        reset_database()
+        services.invalidate_dependency_graph()
+        invalidate_grade_matrix()
+        services.invalidate_model_cache()
+        class_ids = create_school(num_classes=num_classes, students_per_class=students_per_class,
+                                  num_chapters=num_chapters, num_years=num_years, seed=0)
+        class_id = class_ids[-1]
+        grades = services.get_class_grades(class_id)
+        student_id = min(grades)
+        chapter_id, score = next(iter(grades[student_id].items()))
+        engine = db.engine
+
+    statements = {}
+    for endpoint, send in route_requests(class_id, (student_id, chapter_id, score)):
+        # The first request may train or load the model and fill caches
+        send().get_data()
+        with QueryRecorder(engine) as recorder:
+            response = send()
+            response.get_data()
+        assert response.status_code < 400, (endpoint, response.status_code)
+        statements[endpoint] = recorder.statements
+    return statements
+
+
+def budget_problems(runs):
+    """{endpoint: [problem, ...]} for every endpoint of runs, a list of (size, measure(*size))"""
+    problems = {}
+    for endpoint in sorted(runs[0][1]):
+        counts = [len(statements[endpoint]) for _, statements in runs]
+        budget = QUERY_BUDGETS.get(endpoint)
+        problems[endpoint] = []
+        if budget is None:
+            problems[endpoint].append("no budget")
+        elif max(counts) > budget:
+            problems[endpoint].append("over budget")
+        if len(set(counts)) > 1:
+            problems[endpoint].append("grows with school size")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-route SQL query budget guard")
+    parser.add_argument('--allow-real-database', action='store_true',
+                        help="drop and reseed DATABASE_URL even if it is not a throwaway database")
+    args = parser.parse_args(argv)
+    refuse_real_database(app.config['SQLALCHEMY_DATABASE_URI'], args.allow_real_database)
+
+    logging.disable(logging.WARNING)
+    runs = [(size, measure(*size)) for size in SIZES]
+
+    failures = []
+    print(f"{'endpoint':<28} " + ' '.join(f"{'x'.join(map(str, size)):>10}" for size, _ in runs) + f" {'budget':>7}")
+    for endpoint, problems in budget_problems(runs).items():
+        counts = [len(statements[endpoint]) for _, statements in runs]
+        budget = QUERY_BUDGETS.get(endpoint)
+        print(f"{endpoint:<28} " + ' '.join(f"{count:>10}" for count in counts)
+              + f" {budget if budget is not None else '-':>7}  {', '.join(problems)}")
+        if problems:
+            failures.append(endpoint)
+
+    for endpoint in failures:
+        repeated = Counter(runs[-1][1][endpoint]).most_common(3)
+        print(f"\n{endpoint}: most repeated statements on the largest school")
+        for statement, count in repeated:
+            print(f"  {count:>4}x {statement[:160]}")
+
+    if failures:
+        sys.exit(1)
+    print("\nAll routes within their query budget")
+
+
+if __name__ == '__main__':
+    main()
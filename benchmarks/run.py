@@ -0,0 +1,246 @@
+"""Benchmark runner for the services/utils hot paths and every route.
+
+Builds deterministic synthetic schools, times each target and writes the
+timings as JSON so later runs can be compared against them::
+
+    python -m benchmarks.run --size 1000x14 --size 10000x50 --output bench.json
+    python -m benchmarks.run --size 1000x14 --compare bench.json
+
+Sizes are STUDENTSxCHAPTERS (40 students per class, 3 academic years,
+random dependency DAGs). Runs against an in-memory SQLite database and a
+temporary model directory unless DATABASE_URL / EDUTRACK_MODEL_DIR are set.
+Each school drops and recreates every table, so any other database than a
+throwaway SQLite one is refused unless --allow-real-database is passed.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+os.environ.setdefault('EDUTRACK_MODEL_DIR', tempfile.mkdtemp(prefix='edutrack-bench-models-'))
+# Keep debounced background refits out of the timings
+os.environ.setdefault('EDUTRACK_RETRAIN_DELAY', '3600')
+
+import numpy as np
+import sklearn
+
+import services
+import utils
+from app import app, measure_cold_import
+from benchmarks.synthetic import reset_database, create_school, refuse_real_database
+from grade_matrix import invalidate_grade_matrix
+from models import db, Student, Chapter
+
+DEFAULT_SIZES = ['1000x14']
+STUDENTS_PER_CLASS = 40
+NUM_YEARS = 3
+# Relative slowdown against --compare that counts as a regression, and the
+# absolute difference below which timings are treated as noise
+REGRESSION_RATIO = 1.25
+NOISE_FLOOR_MS = 5.0
+# Routes left out of the GET sweep: uploads, background refreshes and the
+# grade writes, which route_targets times with explicit payloads
+SKIPPED_ROUTES = {'static', 'refresh_model_accuracy', 'api_grades_batch', 'update_grades', 'import_grades_file'}
+
+
+def parse_size(size):
+    """'1000x14' -> (1000, 14)"""
+    students, chapters = size.lower().split('x')
+    return int(students), int(chapters)
+
+
+def time_call(func, repeat):
+    """Run func repeat times; returns (first, best, median) in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings[0], min(timings), statistics.median(timings)
+
+
+def service_targets(context):
+    """(name, callable, max repeats) for the services/utils functions"""
+    return [
+        ('build_training_data', services.build_training_data, None),
+        ('train_recommendation_model', services.train_recommendation_model, 1),
+        ('get_recommendations', lambda: services.get_recommendations(context['student_id']), None),
+        ('get_class_recommendations', lambda: services.get_class_recommendations(context['class_id']), None),
+        ('prepare_performance_data',
+         lambda: utils.prepare_performance_data(context['students'], context['chapters']), None),
+        ('get_aggregate_performance', lambda: utils.get_aggregate_performance('year'), None),
+        ('evaluate_model_accuracy', services.evaluate_model_accuracy, 1),
+    ]
+
+
+def route_targets(client, context):
+    """(name, callable, max repeats) for every GET route plus the grade write routes"""
+    class_id = context['class_id']
+    query = f"class_id={class_id}"
+    targets = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if rule.endpoint in SKIPPED_ROUTES or rule.arguments or 'GET' not in rule.methods:
+            continue
+        url = f"{rule.rule}?{query}"
+        targets.append((f"GET {rule.rule}", _request(client.get, url), None))
+    targets.append(("GET /export/grades (xlsx)", _request(client.get, f"/export/grades?{query}&format=xlsx"), None))
+
+    # Writes re-save an existing score so every repeat sees the same data
+    student_id, chapter_id, score = context['grade']
+    targets.append(("POST /grades", _request(
+        client.post, '/grades', data={'student_id': student_id, 'chapter_id': chapter_id, 'score': score * 100}
+    ), None))
+    targets.append(("POST /api/grades/batch", _request(
+        client.post, '/api/grades/batch',
+        json=[{'student_id': student_id, 'chapter_id': chapter_id, 'score': score * 100}]
+    ), None))
+    return targets
+
+
+def _request(method, url, **kwargs):
+    """Callable issuing a test-client request and reading the whole (streamed) body"""
+    def call():
+        response = method(url, **kwargs)
+        assert response.status_code < 400, (url, response.status_code)
+        response.get_data()
+    return call
+
+
+def wait_for_background_work(timeout=600):
+    """Let a background model evaluation finish so it does not skew the next timings"""
+    deadline = time.monotonic() + timeout
+    while services._evaluation['running'] and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+
+def run_size(size, repeat, skip):
+    """Create one synthetic school and time every target against it"""
+    num_students, num_chapters = parse_size(size)
+    num_classes = max(1, -(-num_students // STUDENTS_PER_CLASS))
+    client = app.test_client()
+    results = []
+
+    with app.app_context():
+        started = time.perf_counter()
+        reset_database()
+        services.invalidate_dependency_graph()
+        invalidate_grade_matrix()
+        services.invalidate_model_cache()
+        class_ids = create_school(num_classes=num_classes, students_per_class=STUDENTS_PER_CLASS,
+                                  num_chapters=num_chapters, num_years=NUM_YEARS, seed=0)
+        print(f"{size}: school created in {time.perf_counter() - started:.1f}s")
+
+        class_id = class_ids[0]
+        students = Student.query.filter_by(class_id=class_id).order_by(Student.id).all()
+        chapters = Chapter.query.order_by(Chapter.id).all()
+        grade = services.get_class_grades(class_id)
+        student_id = students[0].id
+        chapter_id, score = next(iter(grade[student_id].items()))
+        context = {'class_id': class_id, 'student_id': student_id, 'students': students,
+                   'chapters': chapters, 'grade': (student_id, chapter_id, score)}
+
+        for name, func, max_repeat in service_targets(context):
+            if name in skip:
+                continue
+            results.append(_measure(size, 'service', name, func, min(repeat, max_repeat or repeat)))
+
+    for name, func, max_repeat in route_targets(client, context):
+        if name in skip:
+            continue
+        results.append(_measure(size, 'route', name, func, min(repeat, max_repeat or repeat)))
+        wait_for_background_work()
+    return results
+
+
+def _measure(size, kind, name, func, repeat):
+    first, best, median = time_call(func, repeat)
+    print(f"{size:>10} {kind:<8} {name:<40} first {first:>10.1f} ms  best {best:>10.1f} ms")
+    return {'size': size, 'kind': kind, 'name': name, 'repeat': repeat,
+            'first_ms': round(first, 3), 'best_ms': round(best, 3), 'median_ms': round(median, 3)}
+
+
+def environment():
+    """Versions and commit the timings were taken on"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    with app.app_context():
+        database = db.engine.dialect.name
+    return {
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scikit-learn': sklearn.__version__,
+        'database': database,
+        'cpu_count': os.cpu_count()
+    }
+
+
+def compare(results, baseline_path):
+    """Print the best-time ratio against a previous run; returns the regressions"""
+    with open(baseline_path) as stream:
+        baseline = {(row['size'], row['name']): row for row in json.load(stream)['results']}
+
+    regressions = []
+    print(f"\n{'size':>10} {'name':<40} {'before ms':>10} {'after ms':>10} {'ratio':>7}")
+    for row in results:
+        before = baseline.get((row['size'], row['name']))
+        if before is None:
+            continue
+        ratio = row['best_ms'] / before['best_ms'] if before['best_ms'] else float('inf')
+        regressed = ratio > REGRESSION_RATIO and row['best_ms'] - before['best_ms'] > NOISE_FLOOR_MS
+        if regressed:
+            regressions.append(row)
+        print(f"{row['size']:>10} {row['name']:<40} {before['best_ms']:>10.1f} {row['best_ms']:>10.1f} "
+              f"{ratio:>6.2f}x{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', action='append', help="STUDENTSxCHAPTERS, repeatable (default 1000x14)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per target (expensive targets run once)")
+    parser.add_argument('--skip', action='append', default=[], help="Target name to leave out, repeatable")
+    parser.add_argument('--boot-runs', type=int, default=3, help="Cold imports to time, 0 to skip")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Previous JSON results; exit 1 on regressions")
+    parser.add_argument('--allow-real-database', action='store_true',
+                        help="drop and reseed DATABASE_URL even if it is not a throwaway database")
+    args = parser.parse_args(argv)
+    refuse_real_database(app.config['SQLALCHEMY_DATABASE_URI'], args.allow_real_database)
+
+    logging.disable(logging.WARNING)
+    results = []
+    if args.boot_runs:
+        timings = [seconds * 1000 for seconds in measure_cold_import(args.boot_runs)]
+        results.append({'size': '-', 'kind': 'boot', 'name': 'import app', 'repeat': args.boot_runs,
+                        'first_ms': round(timings[0], 3), 'best_ms': round(min(timings), 3),
+                        'median_ms': round(statistics.median(timings), 3)})
+        print(f"{'-':>10} {'boot':<8} {'import app':<40} best {min(timings):>10.1f} ms")
+
+    for size in args.size or DEFAULT_SIZES:
+        results.extend(run_size(size, args.repeat, set(args.skip)))
+
+    report = {'environment': environment(), 'sizes': args.size or DEFAULT_SIZES, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump(report, stream, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Deterministic synthetic schools for benchmarks.
+
+reset_database() drops every table, so benchmarks default to a throwaway
+database (in-memory or a SQLite file in the temp directory).
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.engine import make_url
+
+from models import db, AcademicYear, Class, Student, Chapter, ChapterDependency, Grade
+from services import begin_grade_write, rebuild_class_chapter_stats
+
+
+def is_throwaway_database(url):
+    """True for an in-memory SQLite database or a SQLite file in the temp directory"""
+    url = make_url(url)
+    if url.get_backend_name() != 'sqlite':
+        return False
+    if url.database in (None, '', ':memory:'):
+        return True
+    temp_dir = os.path.realpath(tempfile.gettempdir())
+    return os.path.realpath(url.database).startswith(temp_dir + os.sep)
+
+
+def refuse_real_database(url, allow_real_database=False):
+    """Exit unless url is a throwaway database or a real one was explicitly allowed
+
+    For the benchmarks, which drop and reseed the database they run on.
+    """
+    if not allow_real_database and not is_throwaway_database(url):
+        sys.exit(f"Refusing to drop and reseed {make_url(url).render_as_string(hide_password=True)}; "
+                 f"unset DATABASE_URL or pass --allow-real-database")
+
+
+def reset_database():
+    """Drop and recreate every table"""
+    db.drop_all()
+    db.create_all()
+
+
+def random_dependency_dag(num_chapters, max_dependencies=3, rng=None):
+    """Return (chapter_index, dependency_index) pairs forming a random DAG
+
+    A chapter may only depend on chapters with a lower index, which rules
+    out cycles.
+    """
+    rng = rng or np.random.default_rng(0)
+    edges = []
+    for chapter in range(1, num_chapters):
+        count = int(rng.integers(0, min(max_dependencies, chapter) + 1))
+        for dependency in rng.choice(chapter, size=count, replace=False):
+            edges.append((chapter, int(dependency)))
+    return edges
+
+
+def create_school(num_classes=1, students_per_class=40, num_chapters=14, num_years=1,
+                  max_dependencies=3, missing_ratio=0.05, seed=0):
+    """Create a synthetic school and return the created class ids
+
+    Scores follow a per-student ability plus per-chapter difficulty, and
+    about missing_ratio of the cells are left ungraded so the recommendation
+    model has something to predict.
+    """
+    rng = np.random.default_rng(seed)
+
+    chapters = [Chapter(name=f"Bab {i + 1}") for i in range(num_chapters)]
+    years = [AcademicYear(name=f"Tahun Ajaran {2020 + i}/{2021 + i}") for i in range(num_years)]
+    db.session.add_all(chapters + years)
+    db.session.flush()
+
+    classes = [
+        Class(name=f"Kelas {i + 1}", academic_year_id=years[i % num_years].id)
+        for i in range(num_classes)
+    ]
+    db.session.add_all(classes)
+    db.session.flush()
+
+    db.session.execute(insert(ChapterDependency), [
+        {'chapter_id': chapters[chapter].id, 'dependency_id': chapters[dependency].id}
+        for chapter, dependency in random_dependency_dag(num_chapters, max_dependencies, rng)
+    ])
+
+    db.session.execute(insert(Student), [
+        {'name': f"Siswa {class_obj.id}-{i + 1}", 'class_id': class_obj.id}
+        for class_obj in classes for i in range(students_per_class)
+    ])
+    student_ids = np.array([student_id for (student_id,) in db.session.query(Student.id).order_by(Student.id)])
+    chapter_ids = np.array([chapter.id for chapter in chapters])
+
+    ability = rng.uniform(0.55, 0.95, size=(len(student_ids), 1))
+    difficulty = rng.uniform(-0.1, 0.1, size=(1, num_chapters))
+    scores = np.clip(ability + difficulty + rng.normal(0, 0.05, size=(len(student_ids), num_chapters)), 0, 1)
+    graded = rng.random(scores.shape) >= missing_ratio
+
+    # Build the parameter dicts one batch at a time so large schools stay small in memory
+    rows, cols = np.nonzero(graded)
+    revision = begin_grade_write()
+    for start in range(0, len(rows), 50000):
+        batch = slice(start, start + 50000)
+        db.session.execute(insert(Grade), [
+            {'student_id': int(student_ids[i]), 'chapter_id': int(chapter_ids[j]),
+             'score': float(round(scores[i, j], 2)), 'revision': revision}
+            for i, j in zip(rows[batch], cols[batch])
+        ])
+
+    db.session.commit()
+    rebuild_class_chapter_stats()
+    return [class_obj.id for class_obj in classes]
@@ -0,0 +1,149 @@
+import csv
+import io
+import tempfile
+from itertools import groupby
+
+from sqlalchemy import select
+
+from grade_import import NAME_COLUMN, CLASS_COLUMN, GENDER_COLUMN, SHEET_NAME, to_sheet_score
+from models import db, Class, Student, Chapter, ChapterDependency, Grade
+
+# Sheet names of template_dataset_nilai_matematika.xlsx besides SHEET_NAME
+DEPENDENCY_SHEET_NAME = 'Dependency Bab'
+RECOMMENDATION_SHEET_NAME = 'Rekomendasi'
+
+def _chapters():
+    """Chapter (id, name) pairs in column order"""
+    return db.session.query(Chapter.id, Chapter.name).order_by(Chapter.id).all()
+
+def _header(chapters):
+    return [NAME_COLUMN, CLASS_COLUMN, GENDER_COLUMN] + [name for _, name in chapters]
+
+def _scope_conditions(class_id=None, academic_year_id=None):
+    """Filter a statement over Student/Class to one class or academic year"""
+    conditions = []
+    if class_id is not None:
+        conditions.append(Student.class_id == class_id)
+    if academic_year_id is not None:
+        conditions.append(Class.academic_year_id == academic_year_id)
+    return conditions
+
+def iter_grade_rows(class_id=None, academic_year_id=None, batch_size=1000):
+    """
+    Yield the grade sheet row by row: a header, then one row per student
+
+    Grades are read with a single query streamed through yield_per and
+    grouped per student as they arrive, so memory does not grow with the
+    number of students. Ungraded chapters are left empty.
+
+    Args:
+        class_id: Only export this class
+        academic_year_id: Only export classes of this academic year
+        batch_size: Rows fetched from the cursor at a time
+    """
+    chapters = _chapters()
+    column = {chapter_id: 3 + i for i, (chapter_id, _) in enumerate(chapters)}
+    yield _header(chapters)
+
+    statement = select(Student.id, Student.name, Class.name, Grade.chapter_id, Grade.score).join(
+        Class, Class.id == Student.class_id
+    ).outerjoin(Grade, Grade.student_id == Student.id).where(
+        *_scope_conditions(class_id, academic_year_id)
+    ).order_by(Student.id).execution_options(yield_per=batch_size)
+
+    result = db.session.execute(statement)
+    for _, rows in groupby(result, key=lambda row: row[0]):
+        row = None
+        for _, name, class_name, chapter_id, score in rows:
+            if row is None:
+                row = [name, class_name, ''] + [''] * len(chapters)
+            if chapter_id in column and score is not None:
+                row[column[chapter_id]] = to_sheet_score(score)
+        yield row
+
+def iter_recommendation_rows(class_id=None, academic_year_id=None):
+    """
+    Yield recommendations in the grade sheet layout: one row per student
+    with the recommended category in each chapter column
+
+    Recommendations are built one class at a time with a single model call
+    each, so only one class is held in memory.
+    """
+    from services import get_class_recommendations, RECOMMENDATION_ALIASES
+
+    chapters = _chapters()
+    yield _header(chapters)
+
+    query = db.session.query(Class.id, Class.name).order_by(Class.id)
+    if class_id is not None:
+        query = query.filter(Class.id == class_id)
+    if academic_year_id is not None:
+        query = query.filter(Class.academic_year_id == academic_year_id)
+
+    for current_class_id, class_name in query.all():
+        recommendations = get_class_recommendations(current_class_id)
+        students = db.session.query(Student.id, Student.name).filter(
+            Student.class_id == current_class_id
+        ).order_by(Student.id)
+        for student_id, name in students:
+            student_recommendations = recommendations.get(student_id, {})
+            yield [name, class_name, ''] + [
+                RECOMMENDATION_ALIASES.get(label, label)
+                for label in (student_recommendations.get(chapter_id, '') for chapter_id, _ in chapters)
+            ]
+
+def stream_csv(rows, rows_per_chunk=500):
+    """Encode rows as CSV text, yielding a chunk every rows_per_chunk rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def _dependency_rows():
+    """Rows of the 'Dependency Bab' sheet: every chapter with each of its prerequisites"""
+    names = dict(_chapters())
+    prerequisites = {}
+    for chapter_id, dependency_id in db.session.query(
+        ChapterDependency.chapter_id, ChapterDependency.dependency_id
+    ).order_by(ChapterDependency.id):
+        if dependency_id in names:
+            prerequisites.setdefault(chapter_id, []).append(names[dependency_id])
+
+    yield ['Bab', 'Bab Prasyarat']
+    for chapter_id, name in names.items():
+        for prerequisite in prerequisites.get(chapter_id, [None]):
+            yield [name, prerequisite]
+
+def stream_xlsx(rows, sheet_name=SHEET_NAME, chunk_size=64 * 1024):
+    """
+    Write rows to a write-only openpyxl workbook and stream the saved file
+
+    Write-only sheets keep rows on disk rather than in memory. An xlsx file
+    is a zip archive, so it can only be sent once it is complete; it is
+    built in a temporary file and then read back in chunks. The dependency
+    sheet of the template is added so the file matches its layout.
+    """
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    for row in rows:
+        sheet.append([None if value == '' else value for value in row])
+    dependencies = workbook.create_sheet(DEPENDENCY_SHEET_NAME)
+    for row in _dependency_rows():
+        dependencies.append(row)
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
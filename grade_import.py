@@ -0,0 +1,249 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import insert, update
+
+from models import db, Class, Student, Chapter, Grade
+
+# Columns of template_dataset_nilai_matematika.xlsx that are not chapters
+NAME_COLUMN = 'Nama'
+CLASS_COLUMN = 'Kelas'
+GENDER_COLUMN = 'Gender'
+SHEET_NAME = 'Data Nilai'
+# Stored 0-1 scores are rounded to this many decimals (four on the 0-100
+# scale of the sheets), so a stored score and its sheet value convert into
+# each other exactly
+SCORE_DECIMALS = 6
+
+def to_stored_score(value):
+    """0-100 score (sheet or form) -> 0-1 score as stored"""
+    return round(float(value) / 100.0, SCORE_DECIMALS)
+
+def to_sheet_score(score):
+    """Stored 0-1 score -> 0-100 sheet value, an int when it is whole"""
+    value = round(score * 100, SCORE_DECIMALS - 2)
+    return int(value) if value.is_integer() else value
+
+def normalize_scores(values):
+    """
+    Convert raw spreadsheet scores to the 0-1 storage scale
+
+    Sheets are always on the 0-100 scale, like the template and the
+    exports, so 0.8 is 0.8 and not 80. Invalid or out of range values
+    become NaN.
+    """
+    scores = pd.to_numeric(values, errors='coerce').astype(float)
+    scores = scores.where((scores >= 0) & (scores <= 100))
+    return (scores / 100.0).round(SCORE_DECIMALS)
+
+def iter_grade_frames(stream, filename, chunk_size=5000):
+    """
+    Stream a grade sheet as DataFrames of at most chunk_size rows
+
+    CSV files are read with pandas in chunks. Excel files are read row by
+    row with openpyxl in read-only mode, preferring the "Data Nilai" sheet.
+    """
+    if os.path.splitext(filename)[1].lower() == '.csv':
+        for frame in pd.read_csv(stream, chunksize=chunk_size):
+            yield frame.rename(columns=lambda name: str(name).strip())
+        return
+
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        sheet = workbook[SHEET_NAME] if SHEET_NAME in workbook.sheetnames else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name).strip() if name is not None else '' for name in header]
+
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns)
+    finally:
+        workbook.close()
+
+class _GradeImporter:
+    """Resolves classes, students and chapters across chunks of one import"""
+
+    def __init__(self, revision, academic_year_id=None):
+        # Grade revision of the import transaction, from services.begin_grade_write()
+        self.revision = revision
+        self.academic_year_id = int(academic_year_id) if academic_year_id else None
+        self.chapters = {name: chapter_id for chapter_id, name in db.session.query(Chapter.id, Chapter.name)}
+        self.classes = {}
+        self.students = {}
+        self.summary = {
+            'rows': 0,
+            'students_created': 0,
+            'classes_created': 0,
+            'grades_inserted': 0,
+            'grades_updated': 0,
+            'invalid_scores': 0,
+            'skipped_rows': 0,
+            'unknown_columns': []
+        }
+
+    def resolve_classes(self, names):
+        """Map class names to ids, creating missing classes in the chosen year"""
+        missing = [name for name in names if name not in self.classes]
+        if not missing:
+            return
+
+        query = db.session.query(Class.id, Class.name, Class.academic_year_id).filter(Class.name.in_(missing))
+        for class_id, name, year_id in query.order_by(Class.id):
+            # Prefer the class in the chosen academic year when names repeat across years
+            if name not in self.classes or year_id == self.academic_year_id:
+                self.classes[name] = class_id
+
+        to_create = [name for name in missing if name not in self.classes]
+        if to_create and self.academic_year_id:
+            new_classes = [Class(name=name, academic_year_id=self.academic_year_id) for name in to_create]
+            db.session.add_all(new_classes)
+            db.session.flush()
+            self.classes.update({class_obj.name: class_obj.id for class_obj in new_classes})
+            self.summary['classes_created'] += len(new_classes)
+
+        # Load the existing students of every newly resolved class at once
+        class_ids = [self.classes[name] for name in missing if name in self.classes]
+        query = db.session.query(Student.id, Student.class_id, Student.name).filter(Student.class_id.in_(class_ids))
+        for student_id, class_id, name in query.order_by(Student.id):
+            self.students.setdefault((class_id, name), student_id)
+
+    def resolve_students(self, keys):
+        """Map (class_id, name) pairs to student ids, creating missing students"""
+        to_create = [key for key in dict.fromkeys(keys) if key not in self.students]
+        if not to_create:
+            return
+
+        new_students = [Student(class_id=int(class_id), name=name) for class_id, name in to_create]
+        db.session.add_all(new_students)
+        db.session.flush()
+        self.students.update({(student.class_id, student.name): student.id for student in new_students})
+        self.summary['students_created'] += len(new_students)
+
+    def import_frame(self, frame):
+        """Upsert the students and grades of one chunk"""
+        self.summary['rows'] += len(frame)
+        if NAME_COLUMN not in frame.columns or CLASS_COLUMN not in frame.columns:
+            raise ValueError(f"Kolom '{NAME_COLUMN}' dan '{CLASS_COLUMN}' wajib ada")
+
+        chapter_columns = [column for column in frame.columns if column in self.chapters]
+        for column in frame.columns:
+            if column not in chapter_columns and column not in (NAME_COLUMN, CLASS_COLUMN, GENDER_COLUMN, ''):
+                if column not in self.summary['unknown_columns']:
+                    self.summary['unknown_columns'].append(column)
+
+        total_rows = len(frame)
+        frame = frame.assign(
+            **{NAME_COLUMN: frame[NAME_COLUMN].astype('string').str.strip(),
+               CLASS_COLUMN: frame[CLASS_COLUMN].astype('string').str.strip()}
+        )
+        frame = frame[frame[NAME_COLUMN].notna() & frame[CLASS_COLUMN].notna()
+                      & (frame[NAME_COLUMN] != '') & (frame[CLASS_COLUMN] != '')]
+        self.summary['skipped_rows'] += total_rows - len(frame)
+
+        self.resolve_classes(frame[CLASS_COLUMN].unique().tolist())
+        class_ids = frame[CLASS_COLUMN].map(self.classes)
+        unknown_class = class_ids.isna()
+        self.summary['skipped_rows'] += int(unknown_class.sum())
+        frame = frame[~unknown_class].assign(class_id=class_ids[~unknown_class].astype(int))
+        if frame.empty or not chapter_columns:
+            return
+
+        keys = list(zip(frame['class_id'].tolist(), frame[NAME_COLUMN].tolist()))
+        self.resolve_students(keys)
+        frame = frame.assign(student_id=[self.students[key] for key in keys])
+
+        # Student rows x chapter columns -> one (student, chapter, score) row per cell
+        grades = frame.melt(id_vars=['student_id'], value_vars=chapter_columns,
+                            var_name='chapter', value_name='raw_score')
+        grades = grades[grades['raw_score'].notna() & (grades['raw_score'].astype(str).str.strip() != '')]
+        grades = grades.assign(
+            chapter_id=grades['chapter'].map(self.chapters),
+            score=normalize_scores(grades['raw_score'])
+        )
+        invalid = grades['score'].isna()
+        self.summary['invalid_scores'] += int(invalid.sum())
+        grades = grades[~invalid].drop_duplicates(['student_id', 'chapter_id'], keep='last')
+        if grades.empty:
+            return
+
+        self.upsert(grades, frame['class_id'].unique().tolist())
+
+    def upsert(self, grades, class_ids):
+        """Write a chunk of grades with one INSERT and one UPDATE executemany, then its stats deltas"""
+        from services import update_class_chapter_stats
+
+        # Locking read after begin_grade_write(), see update_class_chapter_stats
+        rows = db.session.query(
+            Grade.id, Grade.student_id, Grade.chapter_id, Grade.score
+        ).join(Student, Student.id == Grade.student_id).filter(Student.class_id.in_(class_ids)).with_for_update()
+        existing = {
+            (student_id, chapter_id): (grade_id, score) for grade_id, student_id, chapter_id, score in rows
+        }
+
+        now = datetime.utcnow()
+        inserts = []
+        updates = []
+        changes = []
+        for student_id, chapter_id, score in zip(grades['student_id'].tolist(),
+                                                 grades['chapter_id'].tolist(),
+                                                 grades['score'].tolist()):
+            grade_id, old_score = existing.get((student_id, chapter_id), (None, None))
+            if grade_id is None:
+                inserts.append({'student_id': student_id, 'chapter_id': chapter_id,
+                                'score': score, 'updated_at': now, 'revision': self.revision})
+            else:
+                updates.append({'id': grade_id, 'score': score, 'updated_at': now, 'revision': self.revision})
+            changes.append((student_id, chapter_id, old_score, score))
+
+        if inserts:
+            db.session.execute(insert(Grade), inserts)
+        if updates:
+            db.session.execute(update(Grade), updates)
+        update_class_chapter_stats(changes)
+        self.summary['grades_inserted'] += len(inserts)
+        self.summary['grades_updated'] += len(updates)
+
+def import_grades(stream, filename, academic_year_id=None, chunk_size=5000):
+    """
+    Import a grade sheet in the template_dataset_nilai_matematika.xlsx layout
+
+    Each row is a student (Nama, Kelas, optional Gender) and each remaining
+    column named after a chapter holds that student's score. Students and
+    classes that do not exist yet are created; classes only when an academic
+    year is given. The whole file is imported in one transaction.
+
+    Args:
+        stream: A binary file object (.xlsx) or text/binary stream (.csv)
+        filename: Original file name, used to pick the parser
+        academic_year_id: Academic year for classes that must be created
+        chunk_size: Number of sheet rows processed per batch
+
+    Returns:
+        dict: Counts of imported rows, created students and written grades
+    """
+    from services import begin_grade_write, invalidate_model_cache
+
+    try:
+        importer = _GradeImporter(begin_grade_write(), academic_year_id)
+        for frame in iter_grade_frames(stream, filename, chunk_size):
+            importer.import_frame(frame)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if importer.summary['grades_inserted'] or importer.summary['grades_updated']:
+        invalidate_model_cache()
+
+    return importer.summary
@@ -0,0 +1,214 @@
+"""Read-side grade store: every grade of the school in NumPy arrays
+
+Reading grades through the ORM builds Python objects for every row. Each
+worker process instead keeps one GradeMatrix: a student x chapter float64
+score array with a packed validity bitmask (one bit per cell) and the
+sorted student and chapter ids, which map ids to row and column indices.
+
+It is loaded with one Core query streamed in batches and kept current by
+get_grade_matrix(), which compares a one-query stamp of the tables:
+grades written at a newer revision than the last refresh (see
+models.GradeRevision) and new students are patched in,
+new chapters or removed students reload it. The app never deletes
+grades; call invalidate_grade_matrix() (or restart the workers) after
+deleting grade rows by hand.
+
+A loaded matrix is never written to while requests may be reading it:
+a refresh patches a copy and swaps it in.
+"""
+import threading
+
+import numpy as np
+from sqlalchemy import func, select
+
+from instrumentation import timed
+from models import db, Student, Chapter, Grade
+
+# Grade rows fetched from the cursor at a time
+LOAD_BATCH_SIZE = 100_000
+
+
+def _positions(ids, values):
+    """Index of each value in the sorted ids array; returns (positions, found mask)"""
+    values = np.asarray(values, dtype=np.int64)
+    if len(ids) == 0:
+        return np.zeros(len(values), dtype=np.int64), np.zeros(len(values), dtype=bool)
+    positions = np.minimum(np.searchsorted(ids, values), len(ids) - 1)
+    return positions, ids[positions] == values
+
+
+class GradeMatrix:
+    """Every grade as a float64 student x chapter array with a validity bitmask"""
+
+    def __init__(self, student_ids, student_classes, chapter_ids, stamp):
+        self.student_ids = np.asarray(student_ids, dtype=np.int64)
+        self.student_classes = np.asarray(student_classes, dtype=np.int64)
+        self.chapter_ids = np.asarray(chapter_ids, dtype=np.int64)
+        self.scores = np.zeros((len(self.student_ids), len(self.chapter_ids)), dtype=np.float64)
+        self.valid = np.zeros((len(self.student_ids), (len(self.chapter_ids) + 7) // 8), dtype=np.uint8)
+        self.count = 0
+        self.stamp = stamp
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in
+                   (self.student_ids, self.student_classes, self.chapter_ids, self.scores, self.valid))
+
+    def rows(self, student_ids):
+        return _positions(self.student_ids, student_ids)
+
+    def columns(self, chapter_ids):
+        return _positions(self.chapter_ids, chapter_ids)
+
+    def class_rows(self, class_ids):
+        """Rows of the students in the given classes, in student id order"""
+        return np.flatnonzero(np.isin(self.student_classes, np.asarray(list(class_ids), dtype=np.int64)))
+
+    def mask(self, rows):
+        """Bool array telling which chapters of the given rows are graded"""
+        return np.unpackbits(self.valid[rows], axis=1, count=len(self.chapter_ids)).astype(bool)
+
+    def values(self, rows):
+        """Scores of the given rows, NaN where there is no grade"""
+        scores = self.scores[rows].copy()
+        scores[~self.mask(rows)] = np.nan
+        return scores
+
+    def scores_for(self, student_ids, chapter_ids):
+        """Dense len(student_ids) x len(chapter_ids) float64 scores with NaN for missing grades"""
+        scores = np.full((len(student_ids), len(chapter_ids)), np.nan)
+        rows, row_found = self.rows(student_ids)
+        columns, column_found = self.columns(chapter_ids)
+        if row_found.any() and column_found.any():
+            scores[np.ix_(row_found, column_found)] = self.values(rows[row_found])[:, columns[column_found]]
+        return scores
+
+    def apply(self, student_ids, chapter_ids, scores):
+        """Write grades, one per (student, chapter) pair, into the matrix
+
+        Grades of students or chapters the matrix does not know are skipped.
+
+        Returns:
+            bool: False if any grade was skipped
+        """
+        rows, row_found = self.rows(student_ids)
+        columns, column_found = self.columns(chapter_ids)
+        known = row_found & column_found
+        rows, columns = rows[known], columns[known]
+        bytes_, bits = columns >> 3, (0x80 >> (columns & 7)).astype(np.uint8)
+
+        self.count += int(((self.valid[rows, bytes_] & bits) == 0).sum())
+        self.scores[rows, columns] = np.asarray(scores, dtype=np.float64)[known]
+        np.bitwise_or.at(self.valid, (rows, bytes_), bits)
+        return bool(known.all())
+
+    def with_students(self, student_ids, student_classes, stamp):
+        """Copy of the matrix with rows appended for new students (ids above every known id)"""
+        matrix = GradeMatrix(np.concatenate([self.student_ids, np.asarray(student_ids, dtype=np.int64)]),
+                             np.concatenate([self.student_classes, np.asarray(student_classes, dtype=np.int64)]),
+                             self.chapter_ids, stamp)
+        matrix.scores[:len(self.student_ids)] = self.scores
+        matrix.valid[:len(self.student_ids)] = self.valid
+        matrix.count = self.count
+        return matrix
+
+
+def _stamp():
+    """(newest grade, newest grade revision, students, newest student, chapters, newest chapter) in one query
+
+    Only indexed maxima and the small student and chapter counts, so it
+    stays cheap however many grades there are.
+    """
+    return tuple(db.session.execute(select(
+        select(func.max(Grade.id)).scalar_subquery(),
+        select(func.max(Grade.revision)).scalar_subquery(),
+        select(func.count(Student.id)).scalar_subquery(),
+        select(func.max(Student.id)).scalar_subquery(),
+        select(func.count(Chapter.id)).scalar_subquery(),
+        select(func.max(Chapter.id)).scalar_subquery()
+    )).one())
+
+
+def _read_grades(matrix, since=None):
+    """Stream the grades written after revision since (every grade if None) into the matrix
+
+    Returns:
+        bool: False if a grade belonged to a student or chapter the matrix does not know
+    """
+    statement = select(Grade.student_id, Grade.chapter_id, Grade.score)
+    if since is not None:
+        statement = statement.where(Grade.revision > since)
+    complete = True
+    # Core execution on the session's connection: plain tuples, no ORM row processing
+    result = db.session.connection().execute(statement.execution_options(yield_per=LOAD_BATCH_SIZE))
+    for batch in result.partitions():
+        student_ids, chapter_ids, scores = zip(*batch)
+        complete &= matrix.apply(student_ids, chapter_ids, scores)
+    return complete
+
+
+def load_grade_matrix(stamp=None):
+    """Load every student, chapter and grade into a new GradeMatrix"""
+    stamp = stamp or _stamp()
+    students = db.session.execute(select(Student.id, Student.class_id).order_by(Student.id)).all()
+    chapter_ids = db.session.execute(select(Chapter.id).order_by(Chapter.id)).scalars().all()
+    matrix = GradeMatrix([student_id for student_id, _ in students],
+                         [class_id for _, class_id in students], chapter_ids, stamp)
+    if not _read_grades(matrix):
+        # Written after the student list was read; reload on next use
+        matrix.stamp = None
+    return matrix
+
+
+def _refresh(matrix, stamp):
+    """Copy of matrix brought up to stamp, or None if it must be reloaded
+
+    The matrix passed in is left as it is, since requests may still be
+    reading it.
+    """
+    last_grade, last_revision, students, last_student, chapters, last_chapter = stamp
+    if matrix.stamp is None or matrix.stamp[4:] != (chapters, last_chapter):
+        return None
+
+    added = []
+    if matrix.stamp[2:4] != (students, last_student):
+        newest = int(matrix.student_ids[-1]) if len(matrix.student_ids) else 0
+        added = db.session.execute(
+            select(Student.id, Student.class_id).where(Student.id > newest).order_by(Student.id)
+        ).all()
+        if len(matrix.student_ids) + len(added) != students:
+            return None
+    refreshed = matrix.with_students([student_id for student_id, _ in added],
+                                     [class_id for _, class_id in added], stamp)
+
+    if matrix.stamp[:2] != (last_grade, last_revision):
+        # Revisions are committed in order, so nothing at or below seen is still to come
+        if not _read_grades(refreshed, matrix.stamp[1]):
+            return None
+    return refreshed
+
+
+_matrix_cache = {'matrix': None}
+_matrix_lock = threading.Lock()
+
+
+@timed
+def get_grade_matrix():
+    """The GradeMatrix of this process, refreshed to the current data"""
+    with _matrix_lock:
+        stamp = _stamp()
+        matrix = _matrix_cache['matrix']
+        if matrix is not None and matrix.stamp == stamp:
+            return matrix
+        if matrix is not None:
+            matrix = _refresh(matrix, stamp)
+        if matrix is None:
+            matrix = load_grade_matrix(stamp)
+        _matrix_cache['matrix'] = matrix
+        return matrix
+
+
+def invalidate_grade_matrix():
+    """Drop the loaded matrix; the next read loads it again"""
+    with _matrix_lock:
+        _matrix_cache['matrix'] = None
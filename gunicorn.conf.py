@@ -0,0 +1,18 @@
+# Gunicorn settings, picked up automatically from the working directory
+
+
+def post_worker_init(worker):
+    """Warm-load the newest persisted recommendation model in each worker"""
+    from app import app
+    from services import warm_load_model
+
+    with app.app_context():
+        if warm_load_model():
+            worker.log.info("Loaded persisted recommendation model")
+
+
+def worker_exit(server, worker):
+    """Stop the worker's training process along with it"""
+    from model_training import shutdown_pool
+
+    shutdown_pool()
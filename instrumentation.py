@@ -0,0 +1,210 @@
+"""Opt-in request, query and function instrumentation
+
+Enabled with EDUTRACK_INSTRUMENTATION=1. When enabled:
+
+- every SQL statement is counted and timed per request (SQLAlchemy
+  before/after_cursor_execute),
+- functions wrapped with @timed are timed,
+- responses carry a Server-Timing header (app, db and timed functions),
+- /metrics serves per-endpoint p50/p95/p99 latency, query counts, function
+  timings and Random Forest fit counts in Prometheus text format.
+
+EDUTRACK_PROFILE_RATE (0-1, default 0) additionally runs that fraction of
+requests under cProfile and dumps the stats to EDUTRACK_PROFILE_DIR
+(default instance/profiles), one .prof file per sampled request.
+
+Metrics live in the worker process, so each gunicorn worker reports its
+own. When disabled, @timed returns the function unchanged and no hooks are
+installed.
+"""
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from functools import wraps
+
+ENABLED = os.environ.get('EDUTRACK_INSTRUMENTATION', '').lower() in ('1', 'true', 'yes')
+PROFILE_RATE = float(os.environ.get('EDUTRACK_PROFILE_RATE', 0) or 0)
+# Most recent observations kept per series for the quantiles
+WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _Series:
+    """Count, sum and a window of recent observations"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=WINDOW)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def quantiles(self):
+        values = sorted(self.recent)
+        if not values:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+
+
+_lock = threading.Lock()
+_request_seconds = defaultdict(_Series)
+_request_queries = defaultdict(_Series)
+_query_seconds = defaultdict(float)
+_function_seconds = defaultdict(_Series)
+_counters = defaultdict(float)
+# Query counts and time of work outside a request (background refits, evaluation)
+BACKGROUND = '(background)'
+_profile_lock = threading.Lock()
+
+
+def timed(func):
+    """Record the duration of every call of func (no-op unless instrumentation is enabled)"""
+    if not ENABLED:
+        return func
+
+    name = f"{func.__module__}.{func.__name__}"
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with _lock:
+                _function_seconds[name].observe(elapsed)
+            state = _request_state()
+            if state is not None:
+                state['functions'][name] = state['functions'].get(name, 0.0) + elapsed
+    return wrapper
+
+
+def count_model_fits(fits=1):
+    """Count Random Forest fits (cross-validation counts one per fold)"""
+    if ENABLED:
+        with _lock:
+            _counters['model_fits'] += fits
+
+
+def _request_state():
+    """Per-request counters on flask.g, or None outside a request"""
+    from flask import g, has_request_context
+
+    if not has_request_context():
+        return None
+    return g.get('_instrumentation')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('_query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    state = _request_state()
+    if state is not None:
+        state['queries'] += 1
+        state['query_seconds'] += elapsed
+    else:
+        with _lock:
+            _counters['background_queries'] += 1
+            _query_seconds[BACKGROUND] += elapsed
+
+
+def init_app(app):
+    """Install the query hooks, request timing and /metrics when enabled"""
+    if not ENABLED:
+        return
+
+    from flask import Response, g, request
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    profile_dir = os.environ.get('EDUTRACK_PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+
+    @app.before_request
+    def start_instrumentation():
+        g._instrumentation = {'started': time.perf_counter(), 'queries': 0,
+                              'query_seconds': 0.0, 'functions': {}, 'profiler': None}
+        # One profiled request at a time: cProfile cannot nest across threads
+        if PROFILE_RATE and random.random() < PROFILE_RATE and _profile_lock.acquire(blocking=False):
+            import cProfile
+            profiler = cProfile.Profile()
+            g._instrumentation['profiler'] = profiler
+            profiler.enable()
+
+    @app.after_request
+    def finish_instrumentation(response):
+        state = g.pop('_instrumentation', None)
+        if state is None:
+            return response
+        elapsed = time.perf_counter() - state['started']
+        endpoint = request.endpoint or 'unknown'
+
+        profiler = state['profiler']
+        if profiler is not None:
+            profiler.disable()
+            try:
+                os.makedirs(profile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(profile_dir, f"{endpoint}-{time.time():.6f}.prof"))
+            finally:
+                _profile_lock.release()
+
+        if endpoint != 'metrics':
+            with _lock:
+                _request_seconds[endpoint].observe(elapsed)
+                _request_queries[endpoint].observe(state['queries'])
+                _query_seconds[endpoint] += state['query_seconds']
+
+        timings = [f"app;dur={elapsed * 1000:.1f}",
+                   f'db;dur={state["query_seconds"] * 1000:.1f};desc="{state["queries"]} queries"']
+        timings += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in state['functions'].items()]
+        response.headers['Server-Timing'] = ', '.join(timings)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+def _summary(lines, name, help_text, label, series):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} summary")
+    for key, values in sorted(series.items()):
+        for q, value in values.quantiles().items():
+            lines.append(f'{name}{{{label}="{key}",quantile="{q}"}} {value:.6g}')
+        lines.append(f'{name}_sum{{{label}="{key}"}} {values.total:.6g}')
+        lines.append(f'{name}_count{{{label}="{key}"}} {values.count}')
+
+
+def render_metrics():
+    """All collected metrics in Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        _summary(lines, 'edutrack_request_duration_seconds', 'Request latency per endpoint.',
+                 'endpoint', _request_seconds)
+        _summary(lines, 'edutrack_request_queries', 'SQL statements executed per request.',
+                 'endpoint', _request_queries)
+        lines.append("# HELP edutrack_query_duration_seconds_total Time spent in SQL per endpoint.")
+        lines.append("# TYPE edutrack_query_duration_seconds_total counter")
+        for endpoint, seconds in sorted(_query_seconds.items()):
+            lines.append(f'edutrack_query_duration_seconds_total{{endpoint="{endpoint}"}} {seconds:.6g}')
+        lines.append("# HELP edutrack_background_queries_total SQL statements executed outside requests.")
+        lines.append("# TYPE edutrack_background_queries_total counter")
+        lines.append(f"edutrack_background_queries_total {_counters['background_queries']:.0f}")
+        _summary(lines, 'edutrack_function_duration_seconds', 'Duration of instrumented services/utils functions.',
+                 'function', _function_seconds)
+        lines.append("# HELP edutrack_model_fits_total Random Forest fits, one per cross-validation fold.")
+        lines.append("# TYPE edutrack_model_fits_total counter")
+        lines.append(f"edutrack_model_fits_total {_counters['model_fits']:.0f}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,106 @@
+"""CPU-bound Random Forest fitting, run in a process pool
+
+Fits and cross-validation run in a separate training process, so the
+request threads of a gunicorn worker never compete with them for the GIL.
+The caller waits for the result; with the debounced refit and the model
+evaluation that caller is a background thread, not a request.
+
+EDUTRACK_TRAIN_JOBS is the number of cores one fit may use (default: all
+cores of the machine). Cross-validation splits the budget between folds
+running at the same time and the trees of each fold. Each gunicorn worker
+has its own training process, so with several workers set the budget to
+the cores divided by the number of workers.
+
+Functions run in the pool only receive numpy arrays and parameters and
+are importable without the Flask app, so the spawned process stays light.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+TRAIN_JOBS = max(1, int(os.environ.get('EDUTRACK_TRAIN_JOBS') or 0) or os.cpu_count() or 1)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn rather than fork: the worker holds threads and open connections
+            _pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _discard_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_in_pool(func, *args):
+    """Run func(*args) in the training process and wait for its result
+
+    Falls back to running in the calling thread when processes cannot be
+    started (or the training process died), so training still works on
+    hosts that do not allow them.
+    """
+    try:
+        future = _get_pool().submit(func, *args)
+    except (OSError, RuntimeError) as e:
+        logging.warning("Training process unavailable, fitting in-process: %s", e)
+        _discard_pool()
+        return func(*args)
+    try:
+        return future.result()
+    except BrokenProcessPool as e:
+        logging.warning("Training process died, fitting in-process: %s", e)
+        _discard_pool()
+        return func(*args)
+
+
+def shutdown_pool():
+    """Stop the training process (it is started again on the next fit)
+
+    Runs at interpreter exit; gunicorn also calls it from worker_exit.
+    """
+    _discard_pool()
+
+
+atexit.register(shutdown_pool)
+
+
+def fit_random_forest(X, y, params, jobs=TRAIN_JOBS):
+    """Fit a RandomForestClassifier(**params) using jobs cores
+
+    The fitted model is returned single-threaded: predictions are made on
+    request threads, where a thread pool per call costs more than it saves.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    model = RandomForestClassifier(n_jobs=jobs, **params)
+    model.fit(X, y)
+    model.set_params(n_jobs=None)
+    return model
+
+
+def cross_validate_random_forest(X, y, params, folds, jobs=TRAIN_JOBS):
+    """Cross-validation accuracy of RandomForestClassifier(**params), one score per fold
+
+    Up to jobs folds are fitted at the same time; cores left over are
+    given to the trees of each fold.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import cross_val_score
+
+    fold_jobs = max(1, min(folds, jobs))
+    tree_jobs = max(1, jobs // fold_jobs)
+    model = RandomForestClassifier(n_jobs=tree_jobs, **params)
+    return cross_val_score(model, X, y, cv=folds, n_jobs=fold_jobs)
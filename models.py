@@ -1,4 +1,6 @@
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
 
 db = SQLAlchemy()
 
@@ -22,7 +24,7 @@ class Class(db.Model):
 class Student(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
-    class_id = db.Column(db.Integer, db.ForeignKey('class.id'), nullable=False)
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id'), nullable=False, index=True)
     grades = db.relationship('Grade', backref='student', lazy=True)
     
     def __repr__(self):
@@ -47,17 +49,21 @@ class Chapter(db.Model):
 
 class ChapterDependency(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
-    dependency_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False, index=True)
+    dependency_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False, index=True)
     
     def __repr__(self):
         return f'<ChapterDependency {self.chapter_id} depends on {self.dependency_id}>'
 
 class Grade(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False, index=True)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False, index=True)
     score = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # GradeRevision.revision of the transaction that last wrote the grade, so
+    # workers can tell which grades changed since they last read them
+    revision = db.Column(db.BigInteger, nullable=False, default=0, index=True)
     
     __table_args__ = (
         db.UniqueConstraint('student_id', 'chapter_id', name='unique_student_chapter'),
@@ -65,3 +71,41 @@ class Grade(db.Model):
     
     def __repr__(self):
         return f'<Grade {self.student_id}: {self.chapter_id} = {self.score}>'
+
+class GradeRevision(db.Model):
+    """Single-row counter bumped by every transaction that writes grades
+
+    Unlike Grade.updated_at, which is taken before commit, revisions are
+    handed out in commit order: the row stays locked until the writing
+    transaction ends. See services.begin_grade_write().
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.BigInteger, nullable=False, default=0)
+
+event.listen(GradeRevision.__table__, 'after_create',
+             DDL("INSERT INTO grade_revision (id, revision) VALUES (1, 0)"))
+
+class ClassChapterStats(db.Model):
+    """Running grade aggregates per class and chapter
+
+    Kept in step with every grade write so class summaries read one row per
+    chapter instead of every grade. `flask rebuild-stats` recomputes it.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id'), nullable=False, index=True)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
+    grade_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+    score_sum_squares = db.Column(db.Float, nullable=False, default=0.0)
+    # Grades per performance category (0-1 scale: >=0.9, 0.8-0.9, 0.7-0.8, <0.7)
+    special_class = db.Column(db.Integer, nullable=False, default=0)
+    unnecessary = db.Column(db.Integer, nullable=False, default=0)
+    required = db.Column(db.Integer, nullable=False, default=0)
+    very_necessary = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('class_id', 'chapter_id', name='unique_class_chapter_stats'),
+    )
+    
+    def __repr__(self):
+        return f'<ClassChapterStats {self.class_id}: {self.chapter_id} n={self.grade_count}>'
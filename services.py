@@ -1,7 +1,21 @@
+import os
+import glob
+import hashlib
+import logging
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
-from models import db, AcademicYear, Class, Student, Chapter, ChapterDependency, Grade
+from sqlalchemy import bindparam, case, delete, func, insert, select, update
+from models import db, AcademicYear, Class, Student, Chapter, ChapterDependency, Grade, GradeRevision, ClassChapterStats
+from utils import CATEGORY_BUCKETS
+from instrumentation import timed, count_model_fits
+from grade_matrix import get_grade_matrix
+from grade_import import to_stored_score
+from model_training import TRAIN_JOBS, run_in_pool, fit_random_forest, cross_validate_random_forest
 
 def initialize_sample_data():
     """Initialize sample chapters and their dependencies for the system"""
@@ -27,13 +41,9 @@ def initialize_sample_data():
         "Kombinatorik"
     ]
     
-    chapter_objects = {}
-    
-    for chapter_name in chapters:
-        chapter = Chapter(name=chapter_name)
-        db.session.add(chapter)
-        db.session.flush()  # To get the ID
-        chapter_objects[chapter_name] = chapter
+    chapter_objects = {chapter_name: Chapter(name=chapter_name) for chapter_name in chapters}
+    db.session.add_all(chapter_objects.values())
+    db.session.flush()  # One batched INSERT to get the IDs
     
     # Define dependencies based on the provided image
     dependencies = [
@@ -41,15 +51,13 @@ def initialize_sample_data():
         ("Busur dan Juring Lingkaran", "Lingkaran")
     ]
     
-    for chapter_name, dependency_name in dependencies:
-        chapter = chapter_objects[chapter_name]
-        dependency = chapter_objects[dependency_name]
-        
-        dep = ChapterDependency(
-            chapter_id=chapter.id,
-            dependency_id=dependency.id
-        )
-        db.session.add(dep)
+    db.session.execute(insert(ChapterDependency), [
+        {
+            'chapter_id': chapter_objects[chapter_name].id,
+            'dependency_id': chapter_objects[dependency_name].id
+        }
+        for chapter_name, dependency_name in dependencies
+    ])
     
     db.session.commit()
     
@@ -67,12 +75,9 @@ def initialize_indonesian_sample_data():
         "Tahun Ajaran 2024/2025"
     ]
     
-    year_objects = {}
-    for year_name in academic_years:
-        year = AcademicYear(name=year_name)
-        db.session.add(year)
-        db.session.flush()
-        year_objects[year_name] = year
+    year_objects = {year_name: AcademicYear(name=year_name) for year_name in academic_years}
+    db.session.add_all(year_objects.values())
+    db.session.flush()
         
     # Create classes
     classes = [
@@ -92,12 +97,12 @@ def initialize_indonesian_sample_data():
         ("XII MIPA 8", "Tahun Ajaran 2022/2023")
     ]
     
-    class_objects = {}
-    for class_name, year_name in classes:
-        class_obj = Class(name=class_name, academic_year_id=year_objects[year_name].id)
-        db.session.add(class_obj)
-        db.session.flush()
-        class_objects[class_name] = class_obj
+    class_objects = {
+        class_name: Class(name=class_name, academic_year_id=year_objects[year_name].id)
+        for class_name, year_name in classes
+    }
+    db.session.add_all(class_objects.values())
+    db.session.flush()
         
     # Indonesian names for generating students
     male_first_names = [
@@ -201,21 +206,23 @@ def initialize_indonesian_sample_data():
     
     student_objects = {}
     for student_name, class_name in students:
-        student = Student(name=student_name, class_id=class_objects[class_name].id)
-        db.session.add(student)
-        db.session.flush()
-        student_objects[student_name] = student
+        student_objects[student_name] = Student(name=student_name, class_id=class_objects[class_name].id)
+    db.session.add_all(student_objects.values())
+    db.session.flush()
+    
+    class_names = {class_obj.id: class_name for class_name, class_obj in class_objects.items()}
         
     # Get all chapters
     chapters = Chapter.query.all()
     
-    # Create grades with realistic distributions
+    # Create grades with realistic distributions, collected as plain rows
+    # and written with a single executemany INSERT
     import random
+    grade_rows = []
     
     # For various classes
     for student_name, student in student_objects.items():
-        class_obj = Class.query.get(student.class_id)
-        class_name = class_obj.name if class_obj else ""
+        class_name = class_names.get(student.class_id, "")
         
         if "Kelas 10A" in class_name:
             # Give grades for all chapters to class 10A (our main demo class)
@@ -235,19 +242,17 @@ def initialize_indonesian_sample_data():
                 score = max(50, min(100, score))  # Keep between 50-100
                 
                 # Convert to 0-1 scale for storage
-                normalized_score = float(score) / 100.0
+                normalized_score = to_stored_score(score)
                 
-                grade = Grade(student_id=student.id, chapter_id=chapter.id, score=normalized_score)
-                db.session.add(grade)
+                grade_rows.append({'student_id': student.id, 'chapter_id': chapter.id, 'score': normalized_score})
         
         elif "Kelas 10B" in class_name:
             # Give grades for ALL chapters to class 10B
             for chapter in chapters:
                 score = random.uniform(65, 90)
                 # Convert to 0-1 scale for storage
-                normalized_score = float(score) / 100.0
-                grade = Grade(student_id=student.id, chapter_id=chapter.id, score=normalized_score)
-                db.session.add(grade)
+                normalized_score = to_stored_score(score)
+                grade_rows.append({'student_id': student.id, 'chapter_id': chapter.id, 'score': normalized_score})
                 
         elif "Kelas 11A" in class_name:
             # Class 11A has all chapters covered
@@ -255,9 +260,8 @@ def initialize_indonesian_sample_data():
                 # All students have all grades (removed probability check)
                 score = random.uniform(70, 95)  # Higher average scores for 11A
                 # Convert to 0-1 scale for storage
-                normalized_score = float(score) / 100.0
-                grade = Grade(student_id=student.id, chapter_id=chapter.id, score=normalized_score)
-                db.session.add(grade)
+                normalized_score = to_stored_score(score)
+                grade_rows.append({'student_id': student.id, 'chapter_id': chapter.id, 'score': normalized_score})
                     
         elif "XII MIPA" in class_name:
             # For XII MIPA classes, use the data pattern from the image for MIPA 1 (with variation)
@@ -283,11 +287,13 @@ def initialize_indonesian_sample_data():
                 score = max(50, min(100, round(score)))  # Keep between 50-100 and round to integer
                 
                 # Convert to 0-1 scale for storage
-                normalized_score = float(score) / 100.0
+                normalized_score = to_stored_score(score)
                 
-                grade = Grade(student_id=student.id, chapter_id=chapter.id, score=normalized_score)
-                db.session.add(grade)
+                grade_rows.append({'student_id': student.id, 'chapter_id': chapter.id, 'score': normalized_score})
     
+    if grade_rows:
+        revision = begin_grade_write()
+        db.session.execute(insert(Grade), [dict(row, revision=revision) for row in grade_rows])
     db.session.commit()
 
 def get_performance_category(score):
@@ -301,27 +307,483 @@ def get_performance_category(score):
     else:
         return "Sangat Diperlukan"
 
-def get_student_grades(student_id):
-    """Get all grades for a student"""
-    grades = Grade.query.filter_by(student_id=student_id).all()
+def _grade_dicts(matrix, rows):
+    """{student_id: {chapter_id: score}} for the given GradeMatrix rows, students without grades left out"""
+    values = matrix.values(rows)
     results = {}
-    
-    for grade in grades:
-        results[grade.chapter_id] = grade.score
-    
+    for i, j in zip(*np.nonzero(~np.isnan(values))):
+        results.setdefault(int(matrix.student_ids[rows[i]]), {})[int(matrix.chapter_ids[j])] = float(values[i, j])
     return results
 
+def get_student_grades(student_id):
+    """Get all grades for a student"""
+    matrix = get_grade_matrix()
+    rows, found = matrix.rows([int(student_id)])
+    return _grade_dicts(matrix, rows[found]).get(int(student_id), {})
+
+@timed
+def get_class_grades(class_id):
+    """Get every grade of a class as {student_id: {chapter_id: score}} from the grade matrix"""
+    matrix = get_grade_matrix()
+    return _grade_dicts(matrix, matrix.class_rows([int(class_id)]))
+
+class DependencyGraph:
+    """Chapter prerequisite graph with its closure and ordering precomputed
+
+    Attributes:
+        chapter_ids: Every chapter id, ascending
+        direct: {chapter_id: [dependency_id, ...]} in insertion order, only
+            for chapters that have prerequisites (the get_dependency_graph() shape)
+        transitive: {chapter_id: frozenset of every direct or indirect prerequisite}
+        dependents: {chapter_id: set of chapters that list it as a direct prerequisite}
+        topological_order: Chapters with every prerequisite before the chapters
+            that need it; chapters on or behind a cycle are left out
+        cyclic: Chapters that are their own (indirect) prerequisite
+    """
+
+    def __init__(self, chapter_ids, edges):
+        """
+        Args:
+            chapter_ids: Iterable of chapter ids
+            edges: Iterable of (chapter_id, dependency_id) pairs in insertion order
+        """
+        self.chapter_ids = sorted(set(chapter_ids))
+        self.direct = {}
+        self.dependents = {}
+        for chapter_id, dependency_id in edges:
+            self.direct.setdefault(chapter_id, []).append(dependency_id)
+            self.dependents.setdefault(dependency_id, set()).add(chapter_id)
+
+        nodes = set(self.chapter_ids).union(self.direct, self.dependents)
+
+        # Kahn's algorithm; whatever never reaches in-degree zero sits on or behind a cycle
+        remaining = {node: len(set(self.direct.get(node, ()))) for node in nodes}
+        ready = sorted(node for node, count in remaining.items() if count == 0)
+        order = []
+        while ready:
+            node = ready.pop(0)
+            order.append(node)
+            for dependent in sorted(self.dependents.get(node, ())):
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+        self.topological_order = order
+
+        # Closure in topological order reuses each prerequisite's closure
+        self.transitive = {}
+        for node in order:
+            closure = set()
+            for dependency_id in self.direct.get(node, ()):
+                closure.add(dependency_id)
+                closure |= self.transitive[dependency_id]
+            self.transitive[node] = frozenset(closure)
+        for node in nodes - set(order):
+            self.transitive[node] = frozenset(self._walk(node))
+
+        self.cyclic = {node for node in nodes if node in self.transitive[node]}
+        self._columns = {}
+
+    def _walk(self, chapter_id):
+        """Every prerequisite reachable from chapter_id by walking the edges"""
+        seen = set()
+        stack = list(self.direct.get(chapter_id, ()))
+        while stack:
+            node = stack.pop()
+            if node not in seen:
+                seen.add(node)
+                stack.extend(self.direct.get(node, ()))
+        return seen
+
+    @property
+    def has_cycle(self):
+        return bool(self.cyclic)
+
+    def prerequisites(self, chapter_id, transitive=False):
+        """Direct (or all indirect) prerequisites of a chapter"""
+        if transitive:
+            return self.transitive.get(chapter_id, frozenset())
+        return self.direct.get(chapter_id, [])
+
+    def would_create_cycle(self, chapter_id, dependency_id):
+        """True if making dependency_id a prerequisite of chapter_id closes a loop"""
+        return chapter_id == dependency_id or chapter_id in self.transitive.get(dependency_id, ())
+
+    def dependency_columns(self, chapter_ids):
+        """get_dependency_columns() for this graph, memoized per chapter list"""
+        key = tuple(chapter_ids)
+        columns = self._columns.get(key)
+        if columns is None:
+            columns = self._columns[key] = get_dependency_columns(key, self.direct)
+        return columns
+
+# Process-wide graph, rebuilt when the chapter/dependency stamp changes so a
+# dependency added through another worker is picked up too
+_graph_cache = {'stamp': None, 'graph': None}
+_graph_lock = threading.Lock()
+
+def _dependency_graph_stamp():
+    """Cheap aggregates that change whenever chapters or dependencies do"""
+    return tuple(db.session.execute(select(
+        select(func.count(Chapter.id)).scalar_subquery(),
+        select(func.max(Chapter.id)).scalar_subquery(),
+        select(func.count(ChapterDependency.id)).scalar_subquery(),
+        select(func.max(ChapterDependency.id)).scalar_subquery()
+    )).one())
+
+@timed
+def get_chapter_graph():
+    """Return the cached DependencyGraph, rebuilding it if the data changed"""
+    stamp = _dependency_graph_stamp()
+    with _graph_lock:
+        if _graph_cache['stamp'] == stamp:
+            return _graph_cache['graph']
+
+    chapter_ids = [chapter_id for (chapter_id,) in db.session.query(Chapter.id)]
+    edges = db.session.query(ChapterDependency.chapter_id, ChapterDependency.dependency_id).order_by(
+        ChapterDependency.id
+    ).all()
+    graph = DependencyGraph(chapter_ids, edges)
+    if graph.has_cycle:
+        logging.warning("Chapter dependency cycle between chapters %s", sorted(graph.cyclic))
+
+    with _graph_lock:
+        _graph_cache.update(stamp=stamp, graph=graph)
+    return graph
+
+def invalidate_dependency_graph():
+    """Drop the cached graph of this process"""
+    with _graph_lock:
+        _graph_cache.update(stamp=None, graph=None)
+
 def get_dependency_graph():
     """Build a chapter dependency graph"""
-    dependencies = ChapterDependency.query.all()
-    graph = {}
-    
-    for dep in dependencies:
-        if dep.chapter_id not in graph:
-            graph[dep.chapter_id] = []
-        graph[dep.chapter_id].append(dep.dependency_id)
-    
-    return graph
+    return get_chapter_graph().direct
+
+def begin_grade_write(session=None):
+    """Bump the grade revision for the current transaction and return it
+
+    Call before the transaction's first grade read or write, and store the
+    returned value in Grade.revision of every grade it writes. The bumped
+    row stays locked until commit, so grade writers take turns and a
+    revision becomes visible together with its grades.
+
+    Args:
+        session: Session or connection of the transaction, db.session by default
+    """
+    session = session or db.session
+    table = GradeRevision.__table__
+    if not session.execute(update(table).where(table.c.id == 1).values(revision=table.c.revision + 1)).rowcount:
+        # Table created without its row (the after_create hook inserts it)
+        session.execute(insert(table).values(id=1, revision=1))
+    return session.execute(select(table.c.revision).where(table.c.id == 1)).scalar_one()
+
+@timed
+def upsert_grades(rows, revision):
+    """Insert or update grades in one statement using the dialect's native upsert
+
+    Rows are dicts with student_id, chapter_id and a 0-1 score. Conflicts on
+    the unique_student_chapter constraint update the existing grade.
+    revision comes from begin_grade_write().
+    """
+    if not rows:
+        return
+
+    now = datetime.utcnow()
+    rows = [
+        {'student_id': row['student_id'], 'chapter_id': row['chapter_id'], 'score': row['score'],
+         'updated_at': now, 'revision': revision}
+        for row in rows
+    ]
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(Grade)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Grade.student_id, Grade.chapter_id],
+            set_={'score': statement.excluded.score, 'updated_at': statement.excluded.updated_at,
+                  'revision': statement.excluded.revision}
+        )
+        db.session.execute(statement, rows)
+    elif dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        statement = dialect_insert(Grade)
+        statement = statement.on_duplicate_key_update(
+            score=statement.inserted.score, updated_at=statement.inserted.updated_at,
+            revision=statement.inserted.revision
+        )
+        db.session.execute(statement, rows)
+    else:
+        # Portable fallback: one lookup, then one INSERT and one UPDATE executemany
+        student_ids = {row['student_id'] for row in rows}
+        existing = {
+            (student_id, chapter_id): grade_id
+            for grade_id, student_id, chapter_id in db.session.query(
+                Grade.id, Grade.student_id, Grade.chapter_id
+            ).filter(Grade.student_id.in_(student_ids))
+        }
+        inserts = [row for row in rows if (row['student_id'], row['chapter_id']) not in existing]
+        updates = [
+            {'id': existing[(row['student_id'], row['chapter_id'])], 'score': row['score'], 'updated_at': now,
+             'revision': revision}
+            for row in rows if (row['student_id'], row['chapter_id']) in existing
+        ]
+        if inserts:
+            db.session.execute(insert(Grade), inserts)
+        if updates:
+            db.session.execute(update(Grade), updates)
+
+STATS_TOTALS = ('grade_count', 'score_sum', 'score_sum_squares')
+STATS_BUCKETS = tuple(name for name, _ in CATEGORY_BUCKETS)
+
+def _stats_bucket(score):
+    """ClassChapterStats bucket counting a 0-1 score (same thresholds as CATEGORY_BUCKETS)"""
+    if score >= 0.9:
+        return 'special_class'
+    elif score >= 0.8:
+        return 'unnecessary'
+    elif score >= 0.7:
+        return 'required'
+    return 'very_necessary'
+
+@timed
+def update_class_chapter_stats(changes):
+    """Apply grade writes of the current transaction to ClassChapterStats
+
+    Deltas are summed per (class, chapter) in Python and written with one
+    UPDATE executemany of the form column = column + delta.
+
+    The deltas are only right if old_score is the score the write replaced.
+    Read it in the same transaction, after begin_grade_write(), with a
+    locking read (SELECT ... FOR UPDATE): grade writers then take turns,
+    and the read sees every grade committed before it, even under
+    REPEATABLE READ. Two writers of one grade can then never both
+    subtract the same old score.
+
+    Args:
+        changes: Iterable of (student_id, chapter_id, old_score, new_score);
+            old_score is None for a newly inserted grade
+    """
+    changes = [
+        (int(student_id), int(chapter_id), None if old_score is None else float(old_score), float(new_score))
+        for student_id, chapter_id, old_score, new_score in changes
+    ]
+    if not changes:
+        return
+
+    student_classes = dict(db.session.query(Student.id, Student.class_id).filter(
+        Student.id.in_({student_id for student_id, _, _, _ in changes})
+    ))
+    deltas = {}
+    for student_id, chapter_id, old_score, new_score in changes:
+        class_id = student_classes.get(student_id)
+        if class_id is None:
+            continue
+        delta = deltas.setdefault((class_id, chapter_id), dict.fromkeys(STATS_TOTALS + STATS_BUCKETS, 0))
+        if old_score is not None:
+            delta['grade_count'] -= 1
+            delta['score_sum'] -= old_score
+            delta['score_sum_squares'] -= old_score * old_score
+            delta[_stats_bucket(old_score)] -= 1
+        delta['grade_count'] += 1
+        delta['score_sum'] += new_score
+        delta['score_sum_squares'] += new_score * new_score
+        delta[_stats_bucket(new_score)] += 1
+    if not deltas:
+        return
+
+    # Create the rows of (class, chapter) pairs seen for the first time
+    existing = set(db.session.query(ClassChapterStats.class_id, ClassChapterStats.chapter_id).filter(
+        ClassChapterStats.class_id.in_({class_id for class_id, _ in deltas})
+    ))
+    missing = [{'class_id': class_id, 'chapter_id': chapter_id}
+               for class_id, chapter_id in deltas if (class_id, chapter_id) not in existing]
+    if missing:
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            statement = dialect_insert(ClassChapterStats.__table__).on_conflict_do_nothing()
+        elif dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            statement = dialect_insert(ClassChapterStats.__table__).on_conflict_do_nothing()
+        else:
+            statement = insert(ClassChapterStats.__table__)
+        db.session.execute(statement, [
+            dict(row, **dict.fromkeys(STATS_TOTALS + STATS_BUCKETS, 0)) for row in missing
+        ])
+
+    table = ClassChapterStats.__table__
+    statement = update(table).where(
+        table.c.class_id == bindparam('b_class_id'), table.c.chapter_id == bindparam('b_chapter_id')
+    ).values({column: table.c[column] + bindparam(f'd_{column}') for column in STATS_TOTALS + STATS_BUCKETS})
+    db.session.execute(statement, [
+        dict({f'd_{column}': value for column, value in delta.items()}, b_class_id=class_id, b_chapter_id=chapter_id)
+        for (class_id, chapter_id), delta in deltas.items()
+    ])
+
+def _class_chapter_aggregates():
+    """SELECT computing every ClassChapterStats row from the grades"""
+    return select(
+        Student.class_id,
+        Grade.chapter_id,
+        func.count(Grade.id),
+        func.sum(Grade.score),
+        func.sum(Grade.score * Grade.score),
+        *[func.sum(case((condition, 1), else_=0)) for _, condition in CATEGORY_BUCKETS]
+    ).join(Student, Student.id == Grade.student_id).group_by(Student.class_id, Grade.chapter_id)
+
+def rebuild_class_chapter_stats():
+    """Recompute ClassChapterStats from scratch with one INSERT ... SELECT"""
+    db.session.execute(delete(ClassChapterStats))
+    db.session.execute(insert(ClassChapterStats.__table__).from_select(
+        ['class_id', 'chapter_id'] + list(STATS_TOTALS + STATS_BUCKETS), _class_chapter_aggregates()
+    ))
+    db.session.commit()
+
+def check_class_chapter_stats(tolerance=1e-6):
+    """Compare ClassChapterStats with the grades
+
+    Returns:
+        list: One dict per differing value with class_id, chapter_id,
+            column, stored and expected
+    """
+    columns = list(STATS_TOTALS + STATS_BUCKETS)
+    expected = {(row[0], row[1]): row[2:] for row in db.session.execute(_class_chapter_aggregates())}
+    stored = {
+        (row[0], row[1]): row[2:] for row in db.session.query(
+            ClassChapterStats.class_id, ClassChapterStats.chapter_id,
+            *[getattr(ClassChapterStats, column) for column in columns]
+        )
+    }
+
+    mismatches = []
+    zeros = (0,) * len(columns)
+    for key in sorted(set(expected) | set(stored)):
+        for column, stored_value, expected_value in zip(columns, stored.get(key, zeros), expected.get(key, zeros)):
+            if abs((stored_value or 0) - (expected_value or 0)) > tolerance:
+                mismatches.append({'class_id': key[0], 'chapter_id': key[1], 'column': column,
+                                   'stored': stored_value, 'expected': expected_value})
+    return mismatches
+
+# Last model evaluation in this process. It is recomputed on a background
+# thread when the data version changes, so requests never wait for it.
+_evaluation = {'version': None, 'result': None, 'computed_at': None, 'running': False}
+_evaluation_lock = threading.Lock()
+_evaluation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-evaluation')
+
+def _run_model_evaluation(app, version):
+    """Evaluate the model inside an app context and store the stamped result"""
+    try:
+        with app.app_context():
+            result = evaluate_model_accuracy()
+    except Exception as e:
+        import traceback
+        result = {
+            "error": "Terjadi kesalahan saat mengevaluasi model",
+            "message": str(e),
+            "traceback": traceback.format_exc()
+        }
+    with _evaluation_lock:
+        _evaluation.update(version=version, result=result, computed_at=datetime.utcnow(), running=False)
+
+def get_model_evaluation(refresh=False):
+    """Return the last model evaluation without waiting for a new one
+
+    A background evaluation is started when there is no result yet, when
+    the data version changed since the last one, or when refresh is True.
+
+    Returns:
+        dict: result (None until the first run finishes), computed_at,
+        running and stale flags
+    """
+    from flask import current_app
+
+    version = get_data_version()
+    with _evaluation_lock:
+        stale = _evaluation['version'] != version
+        if (stale or refresh) and not _evaluation['running']:
+            _evaluation['running'] = True
+            _evaluation_executor.submit(_run_model_evaluation, current_app._get_current_object(), version)
+        return {
+            'result': _evaluation['result'],
+            'computed_at': _evaluation['computed_at'],
+            'running': _evaluation['running'],
+            'stale': stale
+        }
+
+@timed
+def get_score_matrix(student_ids, chapter_ids):
+    """Grades as a dense student x chapter array with NaN for missing grades
+
+    Sliced from the process's GradeMatrix instead of read from the database.
+    """
+    return get_grade_matrix().scores_for(student_ids, chapter_ids)
+
+def get_dependency_columns(chapter_ids, dependency_graph):
+    """Precompute, for each chapter, the column indices of its prerequisites
+
+    Returns a list aligned with chapter_ids. Order and duplicates follow the
+    dependency graph; prerequisites outside chapter_ids are dropped.
+    """
+    chapter_index = {chapter_id: j for j, chapter_id in enumerate(chapter_ids)}
+    return [
+        [chapter_index[dep_id] for dep_id in dependency_graph.get(chapter_id, []) if dep_id in chapter_index]
+        for chapter_id in chapter_ids
+    ]
+
+def _dependency_features(scores, dep_cols):
+    """Mean/min/max/std of the graded prerequisite scores for every row
+
+    Missing prerequisite grades are masked out. Rows without any graded
+    prerequisite get zeros, matching the per-student feature lists.
+    """
+    features = np.zeros((scores.shape[0], 4))
+    if not dep_cols:
+        return features
+
+    dep_scores = scores[:, dep_cols]
+    mask = ~np.isnan(dep_scores)
+    count = mask.sum(axis=1)
+    rows = count > 0
+    if not rows.any():
+        return features
+
+    dep_scores, mask, count = dep_scores[rows], mask[rows], count[rows]
+
+    # Move the graded scores to the front of each row, keeping their order,
+    # and reduce rows with the same count together. Summing exactly the
+    # values np.mean/np.std would see keeps the results bit-identical.
+    order = np.argsort(~mask, axis=1, kind='stable')
+    compact = np.take_along_axis(dep_scores, order, axis=1)
+    mean = np.empty(len(compact))
+    std = np.zeros(len(compact))
+    for n in np.unique(count):
+        group = count == n
+        values = np.ascontiguousarray(compact[group, :n])
+        mean[group] = values.sum(axis=1) / n
+        if n > 1:
+            deviation = values - mean[group][:, None]
+            std[group] = np.sqrt((deviation * deviation).sum(axis=1) / n)
+
+    features[rows, 0] = mean
+    features[rows, 1] = np.where(mask, dep_scores, np.inf).min(axis=1)
+    features[rows, 2] = np.where(mask, dep_scores, -np.inf).max(axis=1)
+    features[rows, 3] = std
+    return features
+
+PERFORMANCE_CATEGORIES = ("Kelas Khusus", "Tidak Diperlukan", "Diperlukan", "Sangat Diperlukan")
+
+def get_performance_levels(scores):
+    """Index into PERFORMANCE_CATEGORIES of each score in an array (0-1 scale)"""
+    scores = np.asarray(scores)
+    return np.select([scores >= 0.9, scores >= 0.8, scores >= 0.7], [0, 1, 2], default=3)
+
+def get_performance_categories(scores):
+    """Vectorized get_performance_category for an array of scores"""
+    return np.array(PERFORMANCE_CATEGORIES)[get_performance_levels(scores)]
 
 def ensure_all_students_have_grades():
     """Ensure every student has a grade for each chapter
@@ -332,127 +794,630 @@ def ensure_all_students_have_grades():
     import random
     
     # Get all students and chapters
-    students = Student.query.all()
-    chapters = Chapter.query.all()
+    student_ids = [student_id for (student_id,) in db.session.query(Student.id).order_by(Student.id)]
+    chapter_ids = [chapter_id for (chapter_id,) in db.session.query(Chapter.id).order_by(Chapter.id)]
     
-    # Loop through each student
-    for student in students:
-        # Get existing grades for this student
-        existing_grades = get_student_grades(student.id)
-        
-        # Check each chapter
-        for chapter in chapters:
+    # Read every existing (student, chapter) pair with one query
+    existing = set(db.session.query(Grade.student_id, Grade.chapter_id).all())
+    
+    grade_rows = []
+    for student_id in student_ids:
+        for chapter_id in chapter_ids:
             # If the student doesn't have a grade for this chapter
-            if chapter.id not in existing_grades:
+            if (student_id, chapter_id) not in existing:
                 # Generate a random score between 60-90
                 score = random.uniform(60, 90)
                 
                 # Convert to 0-1 scale for storage
-                normalized_score = float(score) / 100.0
+                normalized_score = to_stored_score(score)
                 
-                # Create new grade
-                grade = Grade(student_id=student.id, chapter_id=chapter.id, score=normalized_score)
-                db.session.add(grade)
+                grade_rows.append({'student_id': student_id, 'chapter_id': chapter_id, 'score': normalized_score})
     
-    # Commit all changes at once
+    # Write all missing grades at once
+    if grade_rows:
+        revision = begin_grade_write()
+        db.session.execute(insert(Grade), [dict(row, revision=revision) for row in grade_rows])
     db.session.commit()
     
     # Return the count of students processed
-    return len(students)
+    return len(student_ids)
 
+def _compute_features(scores, dependency_columns):
+    """Feature tensor for every (student, chapter) cell of a score matrix
+
+    features[i, j] holds the model's feature row for student i and chapter j.
+    """
+    features = np.zeros(scores.shape + (5,))
+    features[:, :, 0] = scores
+    for j, dep_cols in enumerate(dependency_columns):
+        features[:, j, 1:] = _dependency_features(scores, dep_cols)
+    return features
+
+@timed
 def build_training_data():
-    """Build training data for the Random Forest model"""
-    # Get all students and chapters
-    students = Student.query.all()
-    chapters = Chapter.query.all()
-    dependency_graph = get_dependency_graph()
-    
-    # Prepare data
-    X = []  # Features
-    y = []  # Target
-    
-    for student in students:
-        grades = get_student_grades(student.id)
-        
-        for chapter in chapters:
-            # Skip if the student doesn't have a grade for this chapter
-            if chapter.id not in grades:
-                continue
-                
-            # Build features for this student-chapter pair
-            features = []
-            
-            # Current chapter score
-            current_score = grades[chapter.id]
-            
-            # Get dependency scores
-            dependency_scores = []
-            if chapter.id in dependency_graph:
-                for dep_id in dependency_graph[chapter.id]:
-                    if dep_id in grades:
-                        dependency_scores.append(grades[dep_id])
-            
-            # Add features
-            features.append(current_score)
-            
-            # Add dependency statistics
-            if dependency_scores:
-                features.extend([
-                    np.mean(dependency_scores),
-                    np.min(dependency_scores),
-                    np.max(dependency_scores),
-                    np.std(dependency_scores) if len(dependency_scores) > 1 else 0
-                ])
-            else:
-                features.extend([0, 0, 0, 0])  # No dependencies
-            
-            # Determine target category
-            category = get_performance_category(current_score)
-            
-            X.append(features)
-            y.append(category)
-    
-    return np.array(X), np.array(y)
+    """Build training data for the Random Forest model
 
-def train_recommendation_model():
-    """Train a Random Forest model for recommendations"""
-    import numpy as np
-    X, y = build_training_data()
+    Grades are sliced from the grade matrix into a dense student x chapter
+    array, and the dependency statistics for each chapter are computed for all
+    students at once. Rows are ordered by student, then chapter.
+    """
+    student_ids = [student_id for (student_id,) in db.session.query(Student.id).order_by(Student.id)]
+    chapter_ids = [chapter_id for (chapter_id,) in db.session.query(Chapter.id).order_by(Chapter.id)]
+    scores = get_score_matrix(student_ids, chapter_ids)
+    graded = ~np.isnan(scores)
+
+    if not graded.any():
+        return np.array([]), np.array([])
+
+    features = _compute_features(scores, get_chapter_graph().dependency_columns(chapter_ids))
+
+    X = features[graded]
+    y = get_performance_categories(X[:, 0])
+
+    return X, y
+
+class FeatureStore:
+    """Training features kept materialized between model fits
+
+    Holds the dense score matrix and the feature tensor built from it,
+    synced to the grade matrix, which follows the database through its own
+    stamp. When that stamp moves, whoever wrote the grades (this worker,
+    another worker or the import CLI), the scores are compared with the
+    grade matrix and only the rows of students whose grades changed are
+    recomputed. New chapters, removed students or a changed dependency
+    graph rebuild the store.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.stamp = None
+
+    def clear(self):
+        """Forget the materialized data; the next read rebuilds it"""
+        with self.lock:
+            self.stamp = None
+
+    def rebuild(self, matrix, graph):
+        """Materialize every feature row from the grade matrix"""
+        with self.lock:
+            self.student_ids = matrix.student_ids
+            self.chapter_ids = matrix.chapter_ids
+            self.graph = graph
+            self.dependency_columns = graph.dependency_columns(self.chapter_ids.tolist())
+            self.scores = matrix.values(np.arange(len(self.student_ids)))
+            self.features = _compute_features(self.scores, self.dependency_columns)
+            self.stamp = matrix.stamp
+
+    def sync(self):
+        """Bring the store up to the current grade matrix"""
+        matrix = get_grade_matrix()
+        graph = get_chapter_graph()
+        with self.lock:
+            if self.stamp is not None and self.stamp == matrix.stamp and self.graph is graph:
+                return
+            known = len(self.student_ids) if self.stamp is not None else 0
+            if (self.stamp is None or self.graph is not graph
+                    or not np.array_equal(self.chapter_ids, matrix.chapter_ids)
+                    or len(matrix.student_ids) < known
+                    or not np.array_equal(self.student_ids, matrix.student_ids[:known])):
+                self.rebuild(matrix, graph)
+                return
+
+            # Students are only ever appended; their rows start ungraded
+            added = len(matrix.student_ids) - known
+            if added:
+                self.student_ids = matrix.student_ids
+                self.scores = np.vstack([self.scores, np.full((added, len(self.chapter_ids)), np.nan)])
+                self.features = np.concatenate([self.features, np.zeros((added,) + self.features.shape[1:])])
+
+            scores = matrix.values(np.arange(len(self.student_ids)))
+            same = (scores == self.scores) | (np.isnan(scores) & np.isnan(self.scores))
+            # A grade feeds the dependency features of its whole row
+            rows = np.flatnonzero(~same.all(axis=1))
+            if len(rows):
+                self.scores[rows] = scores[rows]
+                self.features[rows] = _compute_features(scores[rows], self.dependency_columns)
+            self.stamp = matrix.stamp
+
+    def training_data(self, student_ids=None):
+        """Return X, y as build_training_data would for the current data
+
+        With student_ids, only the rows of those students.
+        """
+        with self.lock:
+            self.sync()
+            scores, features = self.scores, self.features
+            if student_ids is not None:
+                rows = np.flatnonzero(np.isin(self.student_ids, np.asarray(student_ids, dtype=np.int64)))
+                scores, features = scores[rows], features[rows]
+            graded = ~np.isnan(scores)
+            if not graded.any():
+                return np.array([]), np.array([])
+            X = features[graded]
+            return X, get_performance_categories(X[:, 0])
+
+_feature_store = FeatureStore()
+
+@timed
+def get_training_data(partition=None):
+    """Training data for the current data version, served from the feature store
+
+    With a model partition, only the rows of the students in its classes.
+    """
+    student_ids = None
+    if partition is not None:
+        class_ids = get_model_partitions().get(partition, [])
+        student_ids = [
+            student_id for (student_id,) in
+            db.session.query(Student.id).filter(Student.class_id.in_(class_ids)).order_by(Student.id)
+        ]
+    return _feature_store.training_data(student_ids)
+
+def add_feature_noise(X, noise=0.05, rng=None):
+    """Scale every positive feature by a random factor between 1 - noise and 1 + noise
+
+    Works on the whole matrix at once and returns a new array. Uses a
+    seeded generator by default so the same data always gives the same
+    perturbed matrix (and therefore the same model).
+    """
+    if rng is None:
+        rng = np.random.default_rng(42)
+    X = np.asarray(X, dtype=float)
+    factors = 1 + rng.uniform(-noise, noise, size=X.shape)
+    # Only add noise to non-zero features
+    return np.where(X > 0, X * factors, X)
+
+@timed
+def train_recommendation_model(partition=None):
+    """Train a Random Forest model for recommendations (on one partition's students if given)"""
+    X, y = get_training_data(partition)
     
     # If we don't have enough data, return a dummy model
     if len(X) < 5:
-        model = RandomForestClassifier()
         if len(X) > 0:
             # Fit with the data we have
-            model.fit(X, y)
-        return model
+            model = run_in_pool(fit_random_forest, X, y, {}, TRAIN_JOBS)
+            count_model_fits()
+            return model
+        # Imported lazily: scikit-learn dominates worker start-up time
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier()
     
     # Add realistic noise to training data (educational data is never perfect)
     # We use a smaller noise factor for actual training to maintain good predictions
-    for i in range(len(X)):
-        # Add minimal noise to each feature (between -5% and +5%)
-        for j in range(len(X[i])):
-            if X[i][j] > 0:  # Only add noise to non-zero features
-                noise_factor = np.random.uniform(-0.05, 0.05)
-                X[i][j] *= (1 + noise_factor)
+    X = add_feature_noise(X, noise=0.05)
     
     # Train model with parameters adjusted for educational data
     # - Fewer estimators prevent overfitting to the limited data
     # - Max depth prevents the model from creating too specialized paths
     # - Min samples split ensures each decision is based on enough samples
-    model = RandomForestClassifier(
-        n_estimators=50, 
-        max_depth=6,
-        min_samples_split=3,
-        random_state=42
-    )
-    model.fit(X, y)
+    # The fit itself runs in the training process (see model_training)
+    model = run_in_pool(fit_random_forest, X, y, {
+        'n_estimators': 50,
+        'max_depth': 6,
+        'min_samples_split': 3,
+        'random_state': 42
+    }, TRAIN_JOBS)
+    count_model_fits()
     
     return model
 
+# Features the recommendation model is trained on, in column order.
+# Bump MODEL_SCHEMA_VERSION whenever the feature layout changes so
+# persisted models trained on the old layout are ignored.
+MODEL_FEATURES = ["current_score", "dependency_mean", "dependency_min", "dependency_max", "dependency_std"]
+MODEL_SCHEMA_VERSION = 1
+MODEL_ARTIFACTS_KEPT = 5
+
+# Recommendation models can be partitioned so each cohort has its own,
+# trained on first use and refit only when that cohort's grades change
+# (EDUTRACK_MODEL_PARTITION):
+# - 'none': one school-wide model (default)
+# - 'year': one model per academic year
+# - 'class_group': one model per class group within an academic year, the
+#   class name without its section ("XII MIPA 1" -> "XII MIPA")
+MODEL_PARTITIONS = ('none', 'year', 'class_group')
+MODEL_PARTITION = os.environ.get('EDUTRACK_MODEL_PARTITION', 'none')
+if MODEL_PARTITION not in MODEL_PARTITIONS:
+    raise ValueError(f"EDUTRACK_MODEL_PARTITION must be one of: {', '.join(MODEL_PARTITIONS)}")
+# Trailing section of a class name: "XII MIPA 1", "Kelas 10A", "X IPS B"
+CLASS_SECTION = re.compile(r'(?:\s+(?:\d+|[A-Za-z])|(?<=\d)[A-Za-z])$')
+
+# Fitted recommendation models shared by every request in this process, by
+# partition (None is the school-wide model). Each is keyed by the version of
+# its partition's grade/dependency data plus a local generation:
+# invalidate_model_cache() bumps _model_generation for every partition, a
+# grade commit bumps _partition_generations of the partitions it touched.
+_model_cache = {}
+_model_lock = threading.Lock()
+# Future of the model being loaded or trained for a partition, by partition.
+# Only the cache check and this claim happen under _model_lock; the fit
+# itself runs outside it.
+_model_training = {}
+_model_generation = 0
+_partition_generations = {}
+
+# Debounced background refit. A burst of grade writes keeps pushing the
+# timer back, so it ends in a single fit; until then the previous model
+# keeps serving requests.
+RETRAIN_DELAY = float(os.environ.get('EDUTRACK_RETRAIN_DELAY', 2.0))
+_retrain = {'timer': None, 'running': False, 'all': False, 'partitions': set()}
+_retrain_lock = threading.Lock()
+
+def class_group_name(name):
+    """Class name without its trailing section number or letter ("XII MIPA 1" -> "XII MIPA")"""
+    return CLASS_SECTION.sub('', name.strip()) or name
+
+def model_partition(class_name, academic_year_id):
+    """Partition whose model serves a class, None for the school-wide model"""
+    if MODEL_PARTITION == 'year':
+        return f"year-{academic_year_id}"
+    if MODEL_PARTITION == 'class_group':
+        return f"year-{academic_year_id}/{class_group_name(class_name)}"
+    return None
+
+def get_class_partitions():
+    """{class_id: partition} for every class"""
+    return {
+        class_id: model_partition(name, academic_year_id)
+        for class_id, name, academic_year_id in db.session.query(Class.id, Class.name, Class.academic_year_id)
+    }
+
+def get_model_partitions():
+    """{partition: [class_id, ...]}"""
+    partitions = {}
+    for class_id, partition in sorted(get_class_partitions().items()):
+        partitions.setdefault(partition, []).append(class_id)
+    return partitions
+
+def _partitions_of_classes(class_ids):
+    """Model partition for each of class_ids, or None when models are not partitioned"""
+    if MODEL_PARTITION == 'none':
+        return None
+    partitions = get_class_partitions()
+    return [partitions.get(class_id) for class_id in class_ids]
+
+def _model_key_generation(partition):
+    """Generation a cached model of partition must carry (call with _model_lock held)"""
+    return _model_generation, _partition_generations.get(partition, 0)
+
+def get_data_version(partition=None):
+    """Return a stamp of the grade and dependency data
+
+    Built from cheap aggregates read from the database, so every worker
+    sees the same stamp and a write made by any of them changes it. With a
+    model partition only the grades of its classes are stamped.
+    """
+    grades = db.session.query(func.count(Grade.id), func.max(Grade.revision))
+    if partition is not None:
+        class_ids = get_model_partitions().get(partition, [])
+        grades = grades.join(Student, Student.id == Grade.student_id).filter(Student.class_id.in_(class_ids))
+    grade_count, last_revision = grades.one()
+    dependency_count, last_dependency = db.session.query(
+        func.count(ChapterDependency.id), func.max(ChapterDependency.id)
+    ).one()
+    version = f"g{grade_count}-r{last_revision or 0}-d{dependency_count}-{last_dependency or 0}"
+    return version if partition is None else f"{partition}:{version}"
+
+def get_class_data_version(class_id=None):
+    """Return a stamp of everything the performance view shows for one class
+
+    One query over the class's students and grades plus the chapter list;
+    any grade write, new student or new chapter changes it. Without a
+    class_id the stamp covers the whole school.
+    """
+    students = select(Student.id)
+    if class_id is not None:
+        students = students.where(Student.class_id == class_id)
+    students = students.subquery()
+    class_grades = select(Grade.id, Grade.revision).join(
+        students, students.c.id == Grade.student_id
+    ).subquery()
+    row = db.session.execute(select(
+        select(func.count(students.c.id)).scalar_subquery(),
+        select(func.max(students.c.id)).scalar_subquery(),
+        select(func.count(class_grades.c.id)).scalar_subquery(),
+        select(func.max(class_grades.c.revision)).scalar_subquery(),
+        select(func.count(Chapter.id)).scalar_subquery(),
+        select(func.max(Chapter.id)).scalar_subquery()
+    )).one()
+    student_count, last_student, grade_count, last_revision, chapter_count, last_chapter = row
+    scope = 'all' if class_id is None else class_id
+    return (f"c{scope}-s{student_count}-{last_student or 0}-g{grade_count}-r{last_revision or 0}"
+            f"-ch{chapter_count}-{last_chapter or 0}")
+
+def invalidate_model_cache():
+    """Mark grade/dependency data as changed and schedule a refit of every model
+
+    The feature store is dropped and rebuilt in full. Use
+    commit_grade_changes() for grade edits, which it syncs incrementally.
+    """
+    global _model_generation
+    _feature_store.clear()
+    with _model_lock:
+        _model_generation += 1
+    schedule_retrain()
+
+def commit_grade_changes(changes):
+    """Commit pending grade writes and schedule a refit of the models those
+    grades train
+
+    The feature store picks the writes up from the database on its next read.
+
+    Args:
+        changes: Iterable of (student_id, chapter_id, score) tuples that
+            were written in the current session
+    """
+    changes = [(int(student_id), int(chapter_id), float(score)) for student_id, chapter_id, score in changes]
+    db.session.commit()
+    if not changes:
+        return
+
+    # Only the models of the changed students' partitions go stale
+    partitions = {None}
+    if MODEL_PARTITION != 'none':
+        student_ids = {student_id for student_id, _, _ in changes}
+        class_ids = [class_id for (class_id,) in
+                     db.session.query(Student.class_id).filter(Student.id.in_(student_ids)).distinct()]
+        partitions = set(_partitions_of_classes(class_ids))
+    with _model_lock:
+        for partition in partitions:
+            _partition_generations[partition] = _partition_generations.get(partition, 0) + 1
+    schedule_retrain(partitions=partitions)
+
+def schedule_retrain(delay=None, partitions=None):
+    """Refit models after delay seconds without further writes
+
+    Args:
+        delay: Seconds to wait, RETRAIN_DELAY by default
+        partitions: Partitions whose models to refit; every model when None
+    """
+    try:
+        from flask import current_app
+        app = current_app._get_current_object()
+    except RuntimeError:
+        # Outside an app context there is nothing to refit against yet
+        return
+
+    with _retrain_lock:
+        if partitions is None:
+            _retrain['all'] = True
+        else:
+            _retrain['partitions'].update(partitions)
+        if _retrain['timer'] is not None:
+            _retrain['timer'].cancel()
+        timer = threading.Timer(RETRAIN_DELAY if delay is None else delay, _run_retrain, args=(app,))
+        timer.daemon = True
+        _retrain['timer'] = timer
+        timer.start()
+
+def is_retrain_pending():
+    """True while a debounced refit is scheduled or running"""
+    with _retrain_lock:
+        return _retrain['timer'] is not None or _retrain['running']
+
+def _run_retrain(app):
+    """Timer callback: refit on the current data and swap the models in
+
+    Partitions without a cached model are left to be trained on first use.
+    """
+    with _retrain_lock:
+        _retrain['timer'] = None
+        _retrain['running'] = True
+        refit_all, pending = _retrain['all'], _retrain['partitions']
+        _retrain['all'], _retrain['partitions'] = False, set()
+    try:
+        with app.app_context():
+            with _model_lock:
+                cached = set(_model_cache)
+            if MODEL_PARTITION == 'none':
+                partitions = {None}
+            else:
+                partitions = cached if refit_all else pending & cached
+            for partition in sorted(partitions, key=str):
+                with _model_lock:
+                    generation = _model_key_generation(partition)
+                version = get_data_version(partition)
+                model = train_recommendation_model(partition)
+                try:
+                    save_model_artifact(model, version, partition=partition)
+                except OSError as e:
+                    logging.warning("Could not persist recommendation model: %s", e)
+                with _model_lock:
+                    _model_cache[partition] = {'version': version, 'generation': generation, 'model': model}
+            db.session.remove()
+    except Exception:
+        logging.exception("Background model refit failed")
+    finally:
+        with _retrain_lock:
+            _retrain['running'] = False
+
+def get_model_dir():
+    """Directory holding persisted models (EDUTRACK_MODEL_DIR, default instance/models)"""
+    model_dir = os.environ.get('EDUTRACK_MODEL_DIR')
+    if not model_dir:
+        try:
+            from flask import current_app
+            model_dir = os.path.join(current_app.instance_path, 'models')
+        except RuntimeError:
+            model_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'models')
+    return model_dir
+
+def _model_artifact_path(version, model_dir=None, partition=None):
+    prefix = f"recommendation-v{MODEL_SCHEMA_VERSION}"
+    if partition is not None:
+        prefix += f"-p{hashlib.sha1(partition.encode('utf-8')).hexdigest()[:8]}"
+    digest = hashlib.sha1(version.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(model_dir or get_model_dir(), f"{prefix}-{digest}.joblib")
+
+def _is_compatible_artifact(artifact):
+    """Check that a persisted model matches the current feature schema and scikit-learn"""
+    import sklearn
+
+    return (
+        isinstance(artifact, dict)
+        and artifact.get('schema_version') == MODEL_SCHEMA_VERSION
+        and artifact.get('features') == MODEL_FEATURES
+        and artifact.get('sklearn_version') == sklearn.__version__
+    )
+
+def save_model_artifact(model, version, model_dir=None, partition=None):
+    """Persist a fitted model with its feature schema, data version and partition
+
+    The file is written uncompressed so it loads quickly, and renamed
+    into place so readers never see a partial file. Only the
+    newest MODEL_ARTIFACTS_KEPT artifacts of each partition are kept.
+    """
+    import joblib
+    import sklearn
+
+    model_dir = model_dir or get_model_dir()
+    os.makedirs(model_dir, exist_ok=True)
+    path = _model_artifact_path(version, model_dir, partition)
+    artifact = {
+        'model': model,
+        'features': MODEL_FEATURES,
+        'schema_version': MODEL_SCHEMA_VERSION,
+        'sklearn_version': sklearn.__version__,
+        'data_version': version,
+        'partition_mode': MODEL_PARTITION,
+        'partition': partition,
+        'trained_at': datetime.utcnow()
+    }
+
+    fd, tmp_path = tempfile.mkstemp(dir=model_dir, suffix='.tmp')
+    os.close(fd)
+    try:
+        joblib.dump(artifact, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    # Artifacts of one partition share the file name up to the version digest
+    partitions = {}
+    for artifact_path in sorted(glob.glob(os.path.join(model_dir, 'recommendation-*.joblib')), key=os.path.getmtime):
+        partitions.setdefault(os.path.basename(artifact_path).rsplit('-', 1)[0], []).append(artifact_path)
+    for artifacts in partitions.values():
+        for old_path in artifacts[:-MODEL_ARTIFACTS_KEPT]:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+    return path
+
+def _compatible_artifacts(paths):
+    """Load each readable artifact compatible with this schema and partition mode"""
+    import joblib
+
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        try:
+            artifact = joblib.load(path)
+        except Exception as e:
+            logging.warning("Ignoring unreadable model artifact %s: %s", path, e)
+            continue
+        # Artifacts written before partitioning hold the school-wide model
+        if _is_compatible_artifact(artifact) and artifact.get('partition_mode', 'none') == MODEL_PARTITION:
+            yield artifact
+
+def _newest_artifact_paths(model_dir):
+    return sorted(glob.glob(os.path.join(model_dir, f'recommendation-v{MODEL_SCHEMA_VERSION}-*.joblib')),
+                  key=os.path.getmtime, reverse=True)
+
+def load_model_artifact(version=None, model_dir=None, partition=None):
+    """Load a persisted model of a partition
+
+    Loads the artifact trained on the given data version, or the newest
+    compatible artifact when version is None. Returns None if there is none.
+    """
+    model_dir = model_dir or get_model_dir()
+    if version is not None:
+        candidates = [_model_artifact_path(version, model_dir, partition)]
+    else:
+        candidates = _newest_artifact_paths(model_dir)
+
+    for artifact in _compatible_artifacts(candidates):
+        if artifact.get('partition') == partition and (version is None or artifact['data_version'] == version):
+            return artifact
+    return None
+
+def warm_load_model():
+    """Load the newest compatible persisted model of each partition into this process's cache
+
+    Called once per worker at start-up. A model is only used once a
+    request confirms it was trained on its partition's current data version.
+    """
+    loaded = False
+    for artifact in _compatible_artifacts(_newest_artifact_paths(get_model_dir())):
+        partition = artifact.get('partition')
+        with _model_lock:
+            if partition not in _model_cache:
+                _model_cache[partition] = {'version': artifact['data_version'], 'model': artifact['model'],
+                                           'generation': _model_key_generation(partition)}
+                loaded = True
+    return loaded
+
+@timed
+def get_recommendation_model(partition=None):
+    """Return the cached recommendation model of a partition, retraining it if its data changed
+
+    While a debounced refit is pending the previous model keeps serving.
+    A model persisted by another worker for the current data version is
+    loaded from disk instead of being retrained. A partition's model is
+    trained the first time one of its students is scored.
+
+    Only one thread loads or trains a partition's model at a time. Other
+    callers are served the previous model meanwhile, or wait for the new
+    one when there is none yet.
+    """
+    version = get_data_version(partition)
+    with _model_lock:
+        generation = _model_key_generation(partition)
+        cached = _model_cache.get(partition)
+        if cached is not None and cached['version'] == version and cached['generation'] == generation:
+            return cached['model']
+        if cached is not None and is_retrain_pending():
+            return cached['model']
+        future = _model_training.get(partition)
+        training = future is None
+        if training:
+            future = _model_training[partition] = Future()
+
+    if not training:
+        return cached['model'] if cached is not None else future.result()
+
+    try:
+        artifact = load_model_artifact(version, partition=partition)
+        if artifact is not None:
+            model = artifact['model']
+        else:
+            model = train_recommendation_model(partition)
+            try:
+                save_model_artifact(model, version, partition=partition)
+            except OSError as e:
+                logging.warning("Could not persist recommendation model: %s", e)
+    except BaseException as e:
+        with _model_lock:
+            del _model_training[partition]
+        future.set_exception(e)
+        raise
+
+    with _model_lock:
+        _model_cache[partition] = {'version': version, 'generation': generation, 'model': model}
+        del _model_training[partition]
+    future.set_result(model)
+    return model
+
+# Model and folds of the accuracy evaluation; fits share the TRAIN_JOBS budget
+EVALUATION_MODEL_PARAMS = {'n_estimators': 50, 'max_depth': 5, 'random_state': 42}
+CV_FOLDS = 5
+
+@timed
 def evaluate_model_accuracy():
     """Evaluate accuracy of the recommendation model using k-fold cross-validation"""
-    from sklearn.model_selection import train_test_split, cross_val_score
+    from sklearn.model_selection import train_test_split
     from sklearn.metrics import accuracy_score, precision_recall_fscore_support, classification_report, confusion_matrix
     import random
     import numpy as np
@@ -464,7 +1429,7 @@ def evaluate_model_accuracy():
     # Either use real data or create precomputed realistic metrics 
     # if there's insufficient data for real evaluation
     
-    X, y = build_training_data()
+    X, y = get_training_data()
     
     # Fixed categories for consistency
     categories = ["Kelas Khusus", "Tidak Diperlukan", "Diperlukan", "Sangat Diperlukan"]
@@ -490,8 +1455,8 @@ def evaluate_model_accuracy():
         # This provides more accurate academic results for thesis evaluation
         
         # Train model with parameters adjusted for educational data
-        model = RandomForestClassifier(n_estimators=50, max_depth=5, random_state=42)
-        model.fit(X_train, y_train)
+        model = run_in_pool(fit_random_forest, X_train, y_train, EVALUATION_MODEL_PARAMS, TRAIN_JOBS)
+        count_model_fits()
         
         # Predict on test set with slight realism adjustments
         y_pred_raw = model.predict_proba(X_test)
@@ -542,8 +1507,9 @@ def evaluate_model_accuracy():
         report = classification_report(y_test, y_pred, output_dict=True)
         
         # Calculate real cross-validation scores
-        cv_model = RandomForestClassifier(n_estimators=50, max_depth=5, random_state=42)
-        cv_scores = cross_val_score(cv_model, X, y, cv=5)
+        cv_scores = run_in_pool(cross_validate_random_forest, X, y, EVALUATION_MODEL_PARAMS,
+                                CV_FOLDS, TRAIN_JOBS)
+        count_model_fits(len(cv_scores))
         mean_cv = np.mean(cv_scores)
         
         # Get feature importances with guaranteed proper distribution
@@ -620,64 +1586,274 @@ def evaluate_model_accuracy():
             "samples": len(X)
         }
 
+def _recommendation_codes(student_ids, chapter_ids, scores, graph, partitions=None):
+    """Recommendation of every (student, chapter) cell of a dense score matrix
+
+    Graded chapters map straight to their performance category. Ungraded
+    chapters whose prerequisites are all graded are scored by the model in a
+    single batched predict call per model partition; everything else is
+    "Very Necessary". partitions, aligned with student_ids, picks each
+    student's model (None: the school-wide model for everyone).
+
+    Returns:
+        tuple: (labels, codes) where labels is the sorted list of the labels
+        that occur and codes an int16 student x chapter matrix of indices
+        into it
+    """
+    graded = ~np.isnan(scores)
+    has_grades = graded.any(axis=1)
+
+    # Collect the feature rows for every (student, chapter) pair the model
+    # has to score, one chapter at a time across all students
+    pair_rows = []
+    pair_columns = []
+    feature_blocks = []
+    dependency_columns = graph.dependency_columns(chapter_ids)
+    for j, chapter_id in enumerate(chapter_ids):
+        dep_ids = graph.direct.get(chapter_id)
+        dep_cols = dependency_columns[j]
+        # A dependency on a chapter that no longer exists can never be met
+        if not dep_ids or len(dep_cols) != len(dep_ids):
+            continue
+        rows = np.flatnonzero(has_grades & ~graded[:, j] & graded[:, dep_cols].all(axis=1))
+        if not len(rows):
+            continue
+
+        mean, minimum, maximum, std = _dependency_features(scores[rows], dep_cols).T
+        # Use the mean of the dependencies as a proxy for the current score
+        feature_blocks.append(np.column_stack([mean, mean, minimum, maximum, std]))
+        pair_rows.append(rows)
+        pair_columns.append(np.full(len(rows), j))
+
+    predictions = np.array([], dtype=str)
+    if feature_blocks:
+        features = np.vstack(feature_blocks)
+        pair_rows, pair_columns = np.concatenate(pair_rows), np.concatenate(pair_columns)
+        if partitions is None:
+            predictions = get_recommendation_model().predict(features)
+        else:
+            pair_partitions = np.array(partitions, dtype=object)[pair_rows]
+            predictions = np.empty(len(features), dtype=object)
+            for partition in sorted(set(pair_partitions), key=str):
+                selected = pair_partitions == partition
+                predictions[selected] = get_recommendation_model(partition).predict(features[selected])
+        predictions = predictions.astype(str)
+
+    labels = np.array(sorted({"Very Necessary", *PERFORMANCE_CATEGORIES} | set(np.unique(predictions))))
+    codes = np.full(scores.shape, np.searchsorted(labels, "Very Necessary"), dtype=np.int16)
+    codes[graded] = np.searchsorted(labels, PERFORMANCE_CATEGORIES)[get_performance_levels(scores[graded])]
+    if len(predictions):
+        codes[pair_rows, pair_columns] = np.searchsorted(labels, predictions)
+
+    # Drop labels no cell ended up with
+    present = np.bincount(codes.ravel(), minlength=len(labels)) > 0
+    codes = (np.cumsum(present) - 1).astype(np.int16)[codes]
+    return labels[present].tolist(), codes
+
+def _build_recommendations(student_ids, chapter_ids, scores, graph, partitions=None):
+    """Turn a dense score matrix into {student_id: {chapter_id: category}}
+
+    See _recommendation_codes() for how each cell is decided.
+    """
+    labels, codes = _recommendation_codes(student_ids, chapter_ids, scores, graph, partitions)
+    labels = np.array(labels, dtype=object)
+    return {student_id: dict(zip(chapter_ids, labels[codes[i]].tolist()))
+            for i, student_id in enumerate(student_ids)}
+
+@timed
 def get_recommendations(student_id):
     """Get recommendations for additional classes for a student"""
     student = Student.query.get(student_id)
     if not student:
         return {}
-    
-    # Get all chapters and student grades
-    chapters = Chapter.query.all()
-    student_grades = get_student_grades(student_id)
-    dependency_graph = get_dependency_graph()
-    
-    # If student has no grades, recommend all as "Very Necessary" instead of "No Data"
-    if not student_grades:
-        return {chapter.id: "Very Necessary" for chapter in chapters}
-    
-    # Train model
-    model = train_recommendation_model()
-    
-    # Generate recommendations for each chapter
-    recommendations = {}
-    
-    for chapter in chapters:
-        if chapter.id not in student_grades:
-            # If student doesn't have a grade for this chapter,
-            # check if they have grades for all dependencies
-            if chapter.id in dependency_graph:
-                dependencies_met = True
-                dependency_scores = []
-                
-                for dep_id in dependency_graph[chapter.id]:
-                    if dep_id not in student_grades:
-                        dependencies_met = False
-                        break
-                    dependency_scores.append(student_grades[dep_id])
-                
-                if dependencies_met and dependency_scores:
-                    # Predict recommendation based on dependency scores
-                    features = [
-                        np.mean(dependency_scores),  # Use mean of dependencies as a proxy
-                        np.mean(dependency_scores),
-                        np.min(dependency_scores),
-                        np.max(dependency_scores),
-                        np.std(dependency_scores) if len(dependency_scores) > 1 else 0
-                    ]
-                    
-                    # Predict
-                    prediction = model.predict([features])[0]
-                    recommendations[chapter.id] = prediction
-                else:
-                    # Changed from "Complete Prerequisites" to "Very Necessary"
-                    recommendations[chapter.id] = "Very Necessary"
+
+    chapter_ids = [chapter.id for chapter in Chapter.query.all()]
+    scores = get_score_matrix([student.id], chapter_ids)
+
+    return _build_recommendations([student.id], chapter_ids, scores, get_chapter_graph(),
+                                  _partitions_of_classes([student.class_id]))[student.id]
+
+@timed
+def get_class_recommendations(class_id):
+    """Get recommendations for every student in a class
+
+    Returns:
+        dict: {student_id: {chapter_id: category}}, scored with one model call
+    """
+    student_ids = [
+        student_id for (student_id,) in
+        db.session.query(Student.id).filter_by(class_id=class_id).order_by(Student.id).all()
+    ]
+    if not student_ids:
+        return {}
+
+    chapter_ids = [chapter.id for chapter in Chapter.query.all()]
+    scores = get_score_matrix(student_ids, chapter_ids)
+    partitions = _partitions_of_classes([class_id] * len(student_ids))
+
+    return _build_recommendations(student_ids, chapter_ids, scores, get_chapter_graph(), partitions)
+
+# Category labels shown for the model's English labels (ungraded chapters)
+RECOMMENDATION_ALIASES = {
+    'Special Class': 'Kelas Khusus',
+    'Unnecessary': 'Tidak Diperlukan',
+    'Required': 'Diperlukan',
+    'Very Necessary': 'Sangat Diperlukan'
+}
+RECOMMENDATION_SORTS = ('student', '-student', 'chapter', '-chapter', 'score', '-score')
+
+class RecommendationTable:
+    """Batch recommendations of a cohort, kept as compact student x chapter matrices
+
+    Scores are a float matrix (NaN when ungraded) and recommendations are
+    small integer codes into a label list, so a page is cut out with numpy
+    masks instead of materializing one object per (student, chapter) row.
+    """
+
+    def __init__(self, students, chapters, scores, labels, codes, graph):
+        """
+        Args:
+            students: List of (student_id, name) ordered by id
+            chapters: List of (chapter_id, name) ordered by id
+            scores: Dense student x chapter score matrix
+            labels: Recommendation labels, as returned by _recommendation_codes()
+            codes: Student x chapter matrix of indices into labels
+            graph: DependencyGraph the recommendations were built with
+        """
+        self.student_ids = np.array([student_id for student_id, _ in students], dtype=int)
+        self.student_names = [name for _, name in students]
+        self.chapter_ids = np.array([chapter_id for chapter_id, _ in chapters], dtype=int)
+        self.chapter_names = [name for _, name in chapters]
+        self.scores = scores
+        self.labels = labels
+        self.codes = codes
+
+        # Sort keys: position of each student/chapter in name order
+        self.student_keys = np.array([name.casefold() for name in self.student_names], dtype=str)
+        self.student_rank = np.argsort(np.argsort(self.student_keys, kind='stable'), kind='stable')
+        chapter_keys = np.array([name.casefold() for name in self.chapter_names], dtype=str)
+        self.chapter_rank = np.argsort(np.argsort(chapter_keys, kind='stable'), kind='stable')
+
+        chapter_names = dict(chapters)
+        self.prerequisites = {
+            chapter_id: [chapter_names[dep_id] for dep_id in graph.direct.get(chapter_id, []) if dep_id in chapter_names]
+            for chapter_id, _ in chapters
+        }
+
+    def summary(self):
+        """Count of every recommendation label over the whole cohort"""
+        counts = np.bincount(self.codes.ravel(), minlength=len(self.labels))
+        return {label: int(count) for label, count in zip(self.labels, counts)}
+
+    def page(self, category=None, chapter_id=None, student_prefix=None, sort='student', page=1, per_page=50):
+        """Filter, sort and slice the table
+
+        Args:
+            category: Recommendation label; the Indonesian label also matches
+                its English counterpart
+            chapter_id: Only rows of this chapter
+            student_prefix: Case-insensitive prefix of the student name
+            sort: One of RECOMMENDATION_SORTS; '-' sorts descending. Ties keep
+                the student, chapter order and ungraded rows sort last by score
+            page: 1-based page number
+            per_page: Rows per page
+
+        Returns:
+            tuple: (total matching rows, list of row dicts for the page)
+        """
+        mask = np.ones(self.codes.shape, dtype=bool)
+        if category:
+            wanted = [code for code, label in enumerate(self.labels)
+                      if label == category or RECOMMENDATION_ALIASES.get(label) == category]
+            mask &= np.isin(self.codes, wanted)
+        if chapter_id is not None:
+            mask &= (self.chapter_ids == chapter_id)[np.newaxis, :]
+        if student_prefix:
+            mask &= np.char.startswith(self.student_keys, student_prefix.casefold())[:, np.newaxis]
+
+        # Row-major positions are already in student, chapter order
+        cells = np.flatnonzero(mask)
+        column_count = len(self.chapter_ids)
+        field = sort.lstrip('-')
+        descending = sort.startswith('-')
+        if field == 'score':
+            values = self.scores.ravel()[cells]
+            cells = cells[np.argsort(-values if descending else values, kind='stable')]
+        elif field in ('student', 'chapter'):
+            if field == 'student':
+                keys = self.student_rank[cells // column_count]
             else:
-                # Changed from "Not Started" to "Very Necessary"
-                recommendations[chapter.id] = "Very Necessary"
-        else:
-            # Student has a grade for this chapter
-            score = student_grades[chapter.id]
-            category = get_performance_category(score)
-            recommendations[chapter.id] = category
-    
-    return recommendations
+                keys = self.chapter_rank[cells % column_count]
+            cells = cells[np.argsort(-keys if descending else keys, kind='stable')]
+
+        start = (page - 1) * per_page
+        rows = []
+        for cell in cells[start:start + per_page]:
+            i, j = divmod(int(cell), column_count)
+            score = self.scores[i, j]
+            chapter_id = int(self.chapter_ids[j])
+            rows.append({
+                'student_id': int(self.student_ids[i]),
+                'student': self.student_names[i],
+                'chapter_id': chapter_id,
+                'chapter': self.chapter_names[j],
+                'score': None if np.isnan(score) else float(score),
+                'recommendation': self.labels[self.codes[i, j]],
+                'prerequisites': self.prerequisites[chapter_id]
+            })
+        return len(cells), rows
+
+# Tables of the most recently viewed cohorts (class id, or None for the
+# whole school), so paging does not run the model again
+RECOMMENDATION_TABLES_KEPT = 8
+_recommendation_tables = OrderedDict()
+_recommendation_tables_lock = threading.Lock()
+
+@timed
+def invalidate_recommendation_tables():
+    """Drop the cached tables of this process; the next read rebuilds them"""
+    with _recommendation_tables_lock:
+        _recommendation_tables.clear()
+
+def get_recommendation_table(class_id=None):
+    """Return the RecommendationTable of a class, or of the whole school
+
+    Reused while the cohort's data version, the dependency graph and the
+    serving models are unchanged.
+    """
+    graph = get_chapter_graph()
+    # A class table only depends on its own partition's model
+    serving = None if class_id is None else set(_partitions_of_classes([class_id]) or [None])
+    with _model_lock:
+        model_key = tuple(sorted(
+            (str(partition), entry['version'], entry['generation'])
+            for partition, entry in _model_cache.items() if serving is None or partition in serving
+        ))
+    key = (get_class_data_version(class_id), graph, model_key)
+
+    with _recommendation_tables_lock:
+        entry = _recommendation_tables.get(class_id)
+        if entry is not None and entry[0] == key:
+            _recommendation_tables.move_to_end(class_id)
+            return entry[1]
+
+    query = db.session.query(Student.id, Student.name, Student.class_id)
+    if class_id is not None:
+        query = query.filter(Student.class_id == class_id)
+    rows = query.order_by(Student.id).all()
+    students = [(student_id, name) for student_id, name, _ in rows]
+    chapters = db.session.query(Chapter.id, Chapter.name).order_by(Chapter.id).all()
+    student_ids = [student_id for student_id, _ in students]
+    chapter_ids = [chapter_id for chapter_id, _ in chapters]
+
+    scores = get_score_matrix(student_ids, chapter_ids)
+    partitions = _partitions_of_classes([student_class_id for _, _, student_class_id in rows])
+    labels, codes = _recommendation_codes(student_ids, chapter_ids, scores, graph, partitions)
+    table = RecommendationTable(students, chapters, scores, labels, codes, graph)
+
+    with _recommendation_tables_lock:
+        _recommendation_tables[class_id] = (key, table)
+        _recommendation_tables.move_to_end(class_id)
+        while len(_recommendation_tables) > RECOMMENDATION_TABLES_KEPT:
+            _recommendation_tables.popitem(last=False)
+    return table
@@ -1,38 +1,104 @@
 // Dashboard JavaScript functions
 
+// Chart.js instances of the class on screen, destroyed before switching class
+let dashboardCharts = [];
+
 document.addEventListener('DOMContentLoaded', function() {
-    // Initialize charts if performance data is available
-    if (typeof performanceData !== 'undefined' && performanceData) {
-        initializeCharts(performanceData);
+    const dashboard = document.getElementById('class-dashboard');
+    if (!dashboard) return;
+
+    if (dashboard.dataset.classId) {
+        loadClassDashboard(dashboard.dataset.classId, false);
     }
-    
-    // Add event listener for class selector
+
+    // Switch class in place; the browser revalidates the JSON with its ETag
     const classSelector = document.getElementById('class-selector');
     if (classSelector) {
         classSelector.addEventListener('change', function() {
-            const classId = this.value;
-            if (classId) {
-                window.location.href = `/dashboard?class_id=${classId}`;
-            } else {
-                window.location.href = '/dashboard';
-            }
+            loadClassDashboard(this.value, true);
         });
     }
+
+    window.addEventListener('popstate', function() {
+        const classId = new URLSearchParams(window.location.search).get('class_id') || '';
+        if (classSelector) classSelector.value = classId;
+        loadClassDashboard(classId, false);
+    });
 });
 
+/**
+ * Show the dashboard of a class, or the introduction when no class is chosen
+ * @param {string} classId - Selected class id, empty for none
+ * @param {boolean} pushHistory - Whether to record the switch in the browser history
+ */
+function loadClassDashboard(classId, pushHistory) {
+    const dashboard = document.getElementById('class-dashboard');
+    const intro = document.getElementById('dashboard-intro');
+    const url = classId ? `/dashboard?class_id=${classId}` : '/dashboard';
+
+    if (!classId) {
+        destroyCharts();
+        dashboard.classList.add('d-none');
+        intro.classList.remove('d-none');
+        if (pushHistory) history.pushState({}, '', url);
+        return;
+    }
+
+    fetch(`/api/performance_data?class_id=${encodeURIComponent(classId)}`)
+        .then(response => {
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return response.json();
+        })
+        .then(data => {
+            renderClassInfo(data.class);
+            destroyCharts();
+            intro.classList.add('d-none');
+            dashboard.classList.remove('d-none');
+            initializeCharts(data);
+            if (pushHistory) history.pushState({}, '', url);
+        })
+        .catch(() => {
+            // Fall back to the server-rendered page
+            window.location.href = url;
+        });
+}
+
+/**
+ * Fill the class information card and its links
+ * @param {Object} classInfo - Class name, academic year and student count
+ */
+function renderClassInfo(classInfo) {
+    const dashboard = document.getElementById('class-dashboard');
+    document.getElementById('class-name').textContent = classInfo.name;
+    document.getElementById('class-year').textContent = classInfo.academic_year;
+    document.getElementById('class-student-count').textContent = classInfo.student_count;
+
+    const studentsUrl = `${dashboard.dataset.studentsUrl}?class_id=${classInfo.id}`;
+    document.getElementById('class-students-link').href = studentsUrl;
+    document.getElementById('class-edit-link').href = studentsUrl;
+    document.getElementById('class-recommendations-link').href =
+        `${dashboard.dataset.recommendationsUrl}?class_id=${classInfo.id}`;
+}
+
+function destroyCharts() {
+    dashboardCharts.forEach(chart => chart.destroy());
+    dashboardCharts = [];
+}
+
 /**
  * Initialize all charts on the dashboard
  * @param {Object} data - Performance data for the selected class
  */
 function initializeCharts(data) {
     // Performance distribution chart
-    createPerformanceDistributionChart(data.performance_categories);
+    dashboardCharts.push(createPerformanceDistributionChart(data.performance_categories));
     
     // Average scores chart
-    createAverageScoresChart(data.chapter_names, data.average_scores);
+    dashboardCharts.push(createAverageScoresChart(data.chapter_names, data.average_scores));
     
     // Student performance heatmap
     createPerformanceHeatmap(data);
+    dashboardCharts = dashboardCharts.filter(Boolean);
 }
 
 /**
@@ -43,7 +109,7 @@ function createPerformanceDistributionChart(categories) {
     const ctx = document.getElementById('performance-distribution-chart');
     if (!ctx) return;
     
-    new Chart(ctx, {
+    return new Chart(ctx, {
         type: 'pie',
         data: {
             labels: [
@@ -105,7 +171,7 @@ function createAverageScoresChart(chapterNames, averageScores) {
     }
     
     // Create the chart
-    new Chart(ctx, {
+    return new Chart(ctx, {
         type: 'bar',
         data: {
             labels: filteredChapters,
@@ -219,8 +285,10 @@ function createPerformanceHeatmap(data) {
     table.appendChild(tbody);
     container.appendChild(table);
     
-    // Add CSS for the heatmap
+    // Add CSS for the heatmap once
+    if (document.getElementById('heatmap-style')) return;
     const style = document.createElement('style');
+    style.id = 'heatmap-style';
     style.textContent = `
         .heatmap-table {
             width: 100%;
@@ -1,5 +1,19 @@
 // Recommendations JavaScript functions
 
+const RECOMMENDATION_PAGE_SIZE = 50;
+
+// Filters, sort and paging position of the recommendations table
+const recommendationQuery = {
+    category: '',
+    chapterId: '',
+    student: '',
+    sort: 'student',
+    page: 0,
+    pages: 1,
+    loading: false,
+    request: 0
+};
+
 document.addEventListener('DOMContentLoaded', function() {
     // Add event listener for class selector
     const classSelector = document.getElementById('class-selector');
@@ -14,16 +28,18 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
-    // Initialize categories summary chart if data is available
-    if (typeof recommendationStats !== 'undefined' && recommendationStats) {
-        createRecommendationSummaryChart(recommendationStats);
-    }
+    if (!document.getElementById('recommendation-table')) return;
     
     // Add filter functionality
     initializeFilters();
     
-    // Initialize sortable tables
-    initSortableTables();
+    // Server-side sorting on the table headers
+    initSortableHeaders();
+    
+    // Load further pages on demand
+    initLazyLoading();
+    
+    reloadRecommendations();
 });
 
 /**
@@ -94,103 +110,236 @@ function createRecommendationSummaryChart(stats) {
  * Initialize filtering functionality for recommendations
  */
 function initializeFilters() {
-    const filterSelect = document.getElementById('category-filter');
-    if (!filterSelect) return;
+    const categoryFilter = document.getElementById('category-filter');
+    const chapterFilter = document.getElementById('chapter-filter');
+    const studentFilter = document.getElementById('student-filter');
+    
+    categoryFilter.addEventListener('change', function() {
+        recommendationQuery.category = this.value === 'all' ? '' : this.value;
+        reloadRecommendations();
+    });
+    
+    chapterFilter.addEventListener('change', function() {
+        recommendationQuery.chapterId = this.value;
+        reloadRecommendations();
+    });
     
-    filterSelect.addEventListener('change', function() {
-        const selectedCategory = this.value;
-        const rows = document.querySelectorAll('.recommendation-row');
+    let searchTimer = null;
+    studentFilter.addEventListener('input', function() {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => {
+            recommendationQuery.student = this.value.trim();
+            reloadRecommendations();
+        }, 300);
+    });
+}
+
+/**
+ * Sort by student, chapter or score on the server when a header is clicked
+ */
+function initSortableHeaders() {
+    document.querySelectorAll('#recommendation-table th[data-sort]').forEach(header => {
+        header.addEventListener('click', () => {
+            const field = header.dataset.sort;
+            const isAscending = header.classList.contains('sort-asc');
+            
+            document.querySelectorAll('#recommendation-table th').forEach(th => {
+                th.classList.remove('sort-asc', 'sort-desc');
+            });
+            header.classList.add(isAscending ? 'sort-desc' : 'sort-asc');
+            
+            recommendationQuery.sort = isAscending ? `-${field}` : field;
+            reloadRecommendations();
+        });
         
-        rows.forEach(row => {
-            if (selectedCategory === 'all') {
-                row.style.display = '';
-            } else {
-                const category = row.dataset.category;
-                row.style.display = category === selectedCategory ? '' : 'none';
+        // Add sort indicator and cursor
+        header.classList.add('sortable');
+        header.style.cursor = 'pointer';
+        
+        const arrow = document.createElement('span');
+        arrow.className = 'sort-arrow';
+        arrow.textContent = '⇅';
+        arrow.style.marginLeft = '5px';
+        arrow.style.fontSize = '0.8em';
+        header.appendChild(arrow);
+    });
+}
+
+/**
+ * Fetch the next page when the "load more" button scrolls into view or is clicked
+ */
+function initLazyLoading() {
+    const moreButton = document.getElementById('recommendation-more');
+    moreButton.addEventListener('click', loadNextRecommendationPage);
+    
+    if ('IntersectionObserver' in window) {
+        const observer = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadNextRecommendationPage();
             }
         });
-    });
+        observer.observe(moreButton);
+    }
 }
 
 /**
- * Initialize sortable tables
+ * Clear the table and load the first page for the current filters
  */
-function initSortableTables() {
-    document.querySelectorAll('table.sortable').forEach(table => {
-        table.querySelectorAll('th').forEach(header => {
-            // Don't make action columns sortable
-            if (header.classList.contains('no-sort')) return;
+function reloadRecommendations() {
+    recommendationQuery.page = 0;
+    recommendationQuery.pages = 1;
+    recommendationQuery.loading = false;
+    recommendationQuery.request += 1;
+    document.querySelector('#recommendation-table tbody').innerHTML = '';
+    loadNextRecommendationPage();
+}
+
+function loadNextRecommendationPage() {
+    if (recommendationQuery.loading || recommendationQuery.page >= recommendationQuery.pages) return;
+    
+    const table = document.getElementById('recommendation-table');
+    const params = new URLSearchParams({
+        class_id: table.dataset.classId,
+        sort: recommendationQuery.sort,
+        page: recommendationQuery.page + 1,
+        per_page: RECOMMENDATION_PAGE_SIZE
+    });
+    if (recommendationQuery.category) params.set('category', recommendationQuery.category);
+    if (recommendationQuery.chapterId) params.set('chapter_id', recommendationQuery.chapterId);
+    if (recommendationQuery.student) params.set('student', recommendationQuery.student);
+    
+    // Responses of a superseded filter/sort are dropped
+    const request = recommendationQuery.request;
+    recommendationQuery.loading = true;
+    
+    fetch(`/api/recommendations/page?${params}`)
+        .then(response => {
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return response.json();
+        })
+        .then(data => {
+            if (request !== recommendationQuery.request) return;
+            recommendationQuery.loading = false;
+            recommendationQuery.page = data.page;
+            recommendationQuery.pages = data.pages;
             
-            header.addEventListener('click', () => {
-                const index = Array.from(header.parentNode.children).indexOf(header);
-                const isAscending = header.classList.contains('sort-asc');
-                
-                // Remove sort classes from all headers
-                table.querySelectorAll('th').forEach(th => {
-                    th.classList.remove('sort-asc', 'sort-desc');
-                });
-                
-                // Set new sort class
-                header.classList.add(isAscending ? 'sort-desc' : 'sort-asc');
-                
-                // Sort the table
-                const rows = Array.from(table.querySelectorAll('tbody tr'));
-                const sortedRows = rows.sort((a, b) => {
-                    // Special handling for recommendation categories
-                    if (index === 3) { // Assuming recommendation column is index 3
-                        const aCategory = a.dataset.category;
-                        const bCategory = b.dataset.category;
-                        
-                        // Define category order
-                        const categoryOrder = {
-                            'Very Necessary': 0,
-                            'Required': 1,
-                            'Unnecessary': 2,
-                            'Special Class': 3,
-                            'Complete Prerequisites': 4,
-                            'Not Started': 5
-                        };
-                        
-                        if (categoryOrder[aCategory] !== undefined && categoryOrder[bCategory] !== undefined) {
-                            return isAscending ? 
-                                categoryOrder[aCategory] - categoryOrder[bCategory] : 
-                                categoryOrder[bCategory] - categoryOrder[aCategory];
-                        }
-                    }
-                    
-                    const aValue = a.children[index].textContent.trim();
-                    const bValue = b.children[index].textContent.trim();
-                    
-                    // Try to sort as numbers if possible
-                    const aNum = parseFloat(aValue);
-                    const bNum = parseFloat(bValue);
-                    
-                    if (!isNaN(aNum) && !isNaN(bNum)) {
-                        return isAscending ? aNum - bNum : bNum - aNum;
-                    }
-                    
-                    // Otherwise sort as strings
-                    return isAscending ? 
-                        aValue.localeCompare(bValue) : 
-                        bValue.localeCompare(aValue);
-                });
-                
-                // Reorder table
-                const tbody = table.querySelector('tbody');
-                sortedRows.forEach(row => tbody.appendChild(row));
-            });
+            if (data.page === 1 && !document.getElementById('recommendation-summary-chart').dataset.ready) {
+                createRecommendationSummaryChart(data.summary);
+                document.getElementById('recommendation-summary-chart').dataset.ready = '1';
+            }
             
-            // Add sort indicator and cursor
-            header.classList.add('sortable');
-            header.style.cursor = 'pointer';
+            const tbody = table.querySelector('tbody');
+            data.rows.forEach(row => tbody.appendChild(renderRecommendationRow(row)));
             
-            // Add indicator arrows
-            const arrow = document.createElement('span');
-            arrow.className = 'sort-arrow';
-            arrow.textContent = '⇅';
-            arrow.style.marginLeft = '5px';
-            arrow.style.fontSize = '0.8em';
-            header.appendChild(arrow);
+            document.getElementById('recommendation-count').textContent =
+                `${tbody.children.length} dari ${data.total} baris`;
+            document.getElementById('recommendation-empty').classList.toggle('d-none', data.total > 0);
+            document.getElementById('recommendation-more').classList.toggle('d-none', data.page >= data.pages);
+        })
+        .catch(() => {
+            if (request !== recommendationQuery.request) return;
+            recommendationQuery.loading = false;
+            document.getElementById('recommendation-count').textContent = 'Gagal memuat rekomendasi';
         });
-    });
+}
+
+/**
+ * Build one table row
+ * @param {Object} row - Student, chapter, score, recommendation and prerequisites
+ */
+function renderRecommendationRow(row) {
+    const tr = document.createElement('tr');
+    tr.className = 'recommendation-row';
+    tr.dataset.category = row.recommendation;
+    
+    const studentCell = document.createElement('td');
+    studentCell.textContent = row.student;
+    tr.appendChild(studentCell);
+    
+    const chapterCell = document.createElement('td');
+    chapterCell.textContent = row.chapter;
+    tr.appendChild(chapterCell);
+    
+    const scoreCell = document.createElement('td');
+    const score = document.createElement('span');
+    if (row.score !== null) {
+        score.textContent = (row.score * 100).toFixed(1);
+        score.className = scoreClass(row.score);
+    } else {
+        score.textContent = 'Belum dinilai';
+        score.className = 'text-muted';
+    }
+    scoreCell.appendChild(score);
+    tr.appendChild(scoreCell);
+    
+    const recommendationCell = document.createElement('td');
+    recommendationCell.appendChild(renderRecommendationBadge(row.recommendation));
+    tr.appendChild(recommendationCell);
+    
+    const prerequisiteCell = document.createElement('td');
+    if (row.prerequisites.length) {
+        const list = document.createElement('ul');
+        list.className = 'mb-0 ps-3';
+        row.prerequisites.forEach(name => {
+            const item = document.createElement('li');
+            item.textContent = name;
+            list.appendChild(item);
+        });
+        prerequisiteCell.appendChild(list);
+    } else {
+        const none = document.createElement('span');
+        none.className = 'text-muted';
+        none.textContent = 'Tidak Ada Prasyarat';
+        prerequisiteCell.appendChild(none);
+    }
+    tr.appendChild(prerequisiteCell);
+    
+    return tr;
+}
+
+/**
+ * CSS class for a score on the 0-1 scale
+ * @param {number} score - Score between 0 and 1
+ */
+function scoreClass(score) {
+    if (score >= 0.9) return 'score-special';
+    if (score >= 0.8) return 'score-unnecessary';
+    if (score >= 0.7) return 'score-required';
+    return 'score-very-necessary';
+}
+
+/**
+ * Badge for a recommendation; model labels for ungraded chapters are shown in Indonesian
+ * @param {string} recommendation - Recommendation label
+ */
+function renderRecommendationBadge(recommendation) {
+    const scoreClasses = {
+        'Kelas Khusus': 'score-special',
+        'Tidak Diperlukan': 'score-unnecessary',
+        'Diperlukan': 'score-required',
+        'Sangat Diperlukan': 'score-very-necessary'
+    };
+    const predictedLabels = {
+        'Complete Prerequisites': 'Selesaikan Prasyarat',
+        'Special Class': 'Kelas Khusus',
+        'Unnecessary': 'Tidak Diperlukan',
+        'Required': 'Diperlukan',
+        'Very Necessary': 'Sangat Diperlukan'
+    };
+    
+    const badge = document.createElement('span');
+    if (scoreClasses[recommendation]) {
+        badge.className = scoreClasses[recommendation];
+        badge.textContent = recommendation;
+    } else if (predictedLabels[recommendation]) {
+        badge.className = 'badge bg-warning text-dark';
+        badge.textContent = predictedLabels[recommendation];
+    } else if (recommendation === 'Not Started') {
+        badge.className = 'badge bg-secondary';
+        badge.textContent = 'Belum Dimulai';
+    } else {
+        badge.className = 'badge bg-light text-dark';
+        badge.textContent = recommendation;
+    }
+    return badge;
 }
@@ -31,10 +31,13 @@ document.addEventListener('DOMContentLoaded', function() {
     gradeForms.forEach(form => {
         form.addEventListener('submit', function(e) {
             const scoreInput = form.querySelector('.score-input');
+            e.preventDefault();
             if (!validateScore(scoreInput.value)) {
-                e.preventDefault();
                 showFormError(scoreInput, 'Score must be a number between 0 and 100');
+                return;
             }
+            clearFormError(scoreInput);
+            queueGradeEdit(form, parseFloat(scoreInput.value));
         });
     });
     
@@ -104,6 +107,116 @@ function initializeScoreEditing() {
     });
 }
 
+// Grade edits waiting to be sent, keyed by "studentId:chapterId"
+const pendingGradeEdits = new Map();
+let gradeSaveTimer = null;
+
+/**
+ * Queue an edited cell for the next batch save and show the new score right away
+ * @param {HTMLFormElement} form - The grade form that was submitted
+ * @param {number} score - Score on the 0-100 scale
+ */
+function queueGradeEdit(form, score) {
+    const studentId = form.dataset.studentId;
+    const chapterId = form.dataset.chapterId;
+    const display = document.querySelector(`.score-display[data-student-id="${studentId}"][data-chapter-id="${chapterId}"]`);
+    
+    pendingGradeEdits.set(`${studentId}:${chapterId}`, {
+        student_id: parseInt(studentId),
+        chapter_id: parseInt(chapterId),
+        score: score
+    });
+    
+    // Render the new value and mark the cell as unsaved
+    const normalized = score > 1 ? score / 100 : score;
+    renderScoreDisplay(display, normalized);
+    display.classList.add('score-pending');
+    display.title = 'Menyimpan...';
+    form.style.display = 'none';
+    display.style.display = 'block';
+    
+    // Debounce so a burst of edits goes out as one request
+    clearTimeout(gradeSaveTimer);
+    gradeSaveTimer = setTimeout(saveGradeEdits, 800);
+    setGradeSaveStatus(`${pendingGradeEdits.size} perubahan menunggu disimpan...`);
+}
+
+/**
+ * Render a 0-1 score inside a score display cell
+ * @param {HTMLElement} display - The .score-display element
+ * @param {number} score - Score on the 0-1 scale
+ */
+function renderScoreDisplay(display, score) {
+    let cssClass = 'score-very-necessary';
+    if (score >= 0.9) cssClass = 'score-special';
+    else if (score >= 0.8) cssClass = 'score-unnecessary';
+    else if (score >= 0.7) cssClass = 'score-required';
+    
+    const span = document.createElement('span');
+    span.className = cssClass;
+    span.textContent = (Math.round(score * 1000) / 10).toString();
+    display.replaceChildren(span);
+    display.dataset.score = score;
+}
+
+/**
+ * Send every queued grade edit to /api/grades/batch in one request
+ */
+function saveGradeEdits() {
+    if (pendingGradeEdits.size === 0) return;
+    
+    const edits = Array.from(pendingGradeEdits.values());
+    pendingGradeEdits.clear();
+    setGradeSaveStatus(`Menyimpan ${edits.length} nilai...`);
+    
+    fetch('/api/grades/batch', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify(edits)
+    })
+        .then(response => response.json())
+        .then(data => {
+            (data.results || []).forEach(result => {
+                const edit = edits[result.index];
+                const display = document.querySelector(`.score-display[data-student-id="${edit.student_id}"][data-chapter-id="${edit.chapter_id}"]`);
+                if (!display) return;
+                display.classList.remove('score-pending');
+                if (result.status === 'error') {
+                    display.classList.add('score-error');
+                    display.title = result.message;
+                } else {
+                    display.classList.remove('score-error');
+                    display.title = '';
+                }
+            });
+            if (data.error) {
+                setGradeSaveStatus(`Gagal menyimpan: ${data.error}`, true);
+            } else {
+                setGradeSaveStatus(`${data.saved} nilai tersimpan` + (data.failed ? `, ${data.failed} gagal` : ''), data.failed > 0);
+            }
+        })
+        .catch(error => {
+            // Put the edits back so the next save retries them
+            edits.forEach(edit => {
+                const key = `${edit.student_id}:${edit.chapter_id}`;
+                if (!pendingGradeEdits.has(key)) pendingGradeEdits.set(key, edit);
+            });
+            setGradeSaveStatus(`Gagal menyimpan nilai: ${error}`, true);
+        });
+}
+
+/**
+ * Update the grade save status text below the grid
+ * @param {string} message - Status message
+ * @param {boolean} isError - Whether to highlight the message as an error
+ */
+function setGradeSaveStatus(message, isError = false) {
+    const status = document.getElementById('grade-save-status');
+    if (!status) return;
+    status.textContent = message;
+    status.classList.toggle('text-danger', isError);
+}
+
 /**
  * Show error message for form field
  * @param {HTMLElement} element - Form element with error
@@ -0,0 +1,43 @@
+"""Shared fixtures: the app on a throwaway SQLite file and a small synthetic school"""
+import os
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp(prefix='edutrack-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'edutrack.db')}"
+os.environ['EDUTRACK_MODEL_DIR'] = os.path.join(_tmp_dir, 'models')
+# Refits run only when a test asks for them
+os.environ['EDUTRACK_RETRAIN_DELAY'] = '3600'
+
+import pytest
+
+import services
+from app import app as flask_app
+from benchmarks.run import wait_for_background_work
+from benchmarks.synthetic import reset_database, create_school
+from grade_matrix import invalidate_grade_matrix
+
+
+@pytest.fixture
+def app():
+    flask_app.config['TESTING'] = True
+    wait_for_background_work()
+    with flask_app.app_context():
+        reset_database()
+        services.invalidate_dependency_graph()
+        invalidate_grade_matrix()
+        services.invalidate_model_cache()
+        yield flask_app
+        db_session = services.db.session
+        db_session.rollback()
+        db_session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def class_ids(app):
+    """Two classes of 10 students graded on 6 chapters"""
+    return create_school(num_classes=2, students_per_class=10, num_chapters=6, seed=0)
@@ -0,0 +1,6 @@
+from app import get_boot_budget, measure_cold_import
+
+
+def test_cold_import_within_boot_budget():
+    # Same check as `flask check-boot`: the slowest of three fresh interpreters
+    assert max(measure_cold_import(3)) < get_boot_budget()
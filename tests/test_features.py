@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+from sqlalchemy import create_engine, update
+
+import services
+from grade_matrix import invalidate_grade_matrix
+from models import db, Grade, Student
+
+
+def _rebuilt_training_data():
+    """Training data read from scratch, bypassing every cache of this process"""
+    invalidate_grade_matrix()
+    return services.build_training_data()
+
+
+def test_feature_store_sees_grades_written_by_another_process(app, class_ids):
+    X_before, _ = services.get_training_data()
+    student_ids = [student.id for student in Student.query.filter_by(class_id=class_ids[1])]
+    db.session.commit()
+
+    # Another worker or the import CLI: its own engine and connection
+    engine = create_engine(os.environ['DATABASE_URL'])
+    with engine.begin() as connection:
+        revision = services.begin_grade_write(connection)
+        connection.execute(update(Grade).where(Grade.student_id.in_(student_ids))
+                           .values(score=0.05, revision=revision))
+    engine.dispose()
+
+    X, y = services.get_training_data()
+    X_expected, y_expected = _rebuilt_training_data()
+    assert not np.array_equal(X, X_before)
+    np.testing.assert_array_equal(X, X_expected)
+    np.testing.assert_array_equal(y, y_expected)
+
+
+def test_feature_store_keeps_foreign_writes_behind_a_local_one(app, class_ids):
+    services.get_training_data()
+    students = Student.query.filter_by(class_id=class_ids[0]).order_by(Student.id).all()
+    db.session.commit()
+
+    engine = create_engine(os.environ['DATABASE_URL'])
+    with engine.begin() as connection:
+        revision = services.begin_grade_write(connection)
+        connection.execute(update(Grade).where(Grade.student_id == students[1].id)
+                           .values(score=0.1, revision=revision))
+    engine.dispose()
+
+    # A local write committed after the foreign one
+    revision = services.begin_grade_write()
+    grade = Grade.query.filter_by(student_id=students[0].id).first()
+    grade.score, grade.revision = 0.2, revision
+    services.commit_grade_changes([(grade.student_id, grade.chapter_id, grade.score)])
+
+    X, _ = services.get_training_data()
+    X_expected, _ = _rebuilt_training_data()
+    np.testing.assert_array_equal(X, X_expected)
@@ -0,0 +1,43 @@
+import io
+
+import pytest
+
+import services
+from grade_export import iter_grade_rows, stream_csv, stream_xlsx
+from grade_import import import_grades
+from models import db, Grade, Student
+
+
+def _class_grades(class_id):
+    db.session.expire_all()
+    return {(g.student_id, g.chapter_id): g.score
+            for g in Grade.query.join(Student).filter(Student.class_id == class_id)}
+
+
+@pytest.fixture
+def seeded_class(app):
+    services.initialize_sample_data()
+    services.initialize_indonesian_sample_data()
+    services.ensure_all_students_have_grades()
+    student = Student.query.filter_by(class_id=1).first()
+    revision = services.begin_grade_write()
+    grade = Grade.query.filter_by(student_id=student.id).first()
+    # 0.8%, which used to come back as 80%
+    grade.score, grade.revision = 0.008, revision
+    db.session.commit()
+    return 1
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'xlsx'])
+def test_export_then_import_keeps_grades(seeded_class, fmt):
+    before = _class_grades(seeded_class)
+    rows = iter_grade_rows(class_id=seeded_class)
+    if fmt == 'csv':
+        stream = io.StringIO(''.join(stream_csv(rows)))
+    else:
+        stream = io.BytesIO(b''.join(stream_xlsx(rows)))
+
+    import_grades(stream, f'nilai.{fmt}')
+
+    assert 0.008 in before.values()
+    assert _class_grades(seeded_class) == before
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from sqlalchemy import func, update
+
+import services
+from grade_matrix import get_grade_matrix
+from models import db, Grade, Student
+
+
+def _set_score(grade_id, score, updated_at=None):
+    values = {'score': score, 'revision': services.begin_grade_write()}
+    if updated_at is not None:
+        values['updated_at'] = updated_at
+    db.session.execute(update(Grade).where(Grade.id == grade_id).values(values))
+    db.session.commit()
+
+
+def _matrix_score(matrix, grade):
+    return matrix.scores_for([grade.student_id], [grade.chapter_id])[0, 0]
+
+
+def test_matrix_scores_equal_stored_scores(app, class_ids):
+    _set_score(Grade.query.first().id, 0.123456789)
+
+    matrix = get_grade_matrix()
+
+    assert all(_matrix_score(matrix, g) == g.score for g in Grade.query)
+
+
+def test_refresh_leaves_the_served_matrix_untouched(app, class_ids):
+    grade = Grade.query.first()
+    before = get_grade_matrix()
+    old_score = _matrix_score(before, grade)
+
+    _set_score(grade.id, 0.01)
+    after = get_grade_matrix()
+
+    assert after is not before
+    assert _matrix_score(before, grade) == old_score
+    assert _matrix_score(after, grade) == 0.01
+
+
+def test_update_committed_with_an_older_timestamp_is_seen(app, class_ids):
+    # e.g. an import that took its timestamp before an edit, but committed after it
+    grade = Grade.query.order_by(Grade.id).first()
+    class_id = db.session.get(Student, grade.student_id).class_id
+    last_write = db.session.query(func.max(Grade.updated_at)).scalar()
+    get_grade_matrix()
+    data_version = services.get_data_version()
+    class_version = services.get_class_data_version(class_id)
+
+    _set_score(grade.id, 0.22, last_write - timedelta(minutes=10))
+
+    assert _matrix_score(get_grade_matrix(), grade) == 0.22
+    assert services.get_data_version() != data_version
+    assert services.get_class_data_version(class_id) != class_version
@@ -0,0 +1,107 @@
+import threading
+
+from models import db, Grade, Student
+from services import check_class_chapter_stats
+
+
+def _grade_count():
+    return db.session.query(Grade).count()
+
+
+def test_update_grades_saves_score(client, class_ids):
+    student = Student.query.filter_by(class_id=class_ids[0]).first()
+    response = client.post('/grades', data={'student_id': student.id, 'chapter_id': 1, 'score': '75'})
+
+    assert response.status_code == 302
+    grade = Grade.query.filter_by(student_id=student.id, chapter_id=1).one()
+    assert grade.score == 0.75
+
+
+def test_update_grades_rejects_unknown_student(client, class_ids):
+    before = _grade_count()
+    response = client.post('/grades', data={'student_id': 999999, 'chapter_id': 1, 'score': '75'},
+                           follow_redirects=True)
+
+    assert response.status_code == 200
+    assert 'Siswa tidak ditemukan' in response.get_data(as_text=True)
+    assert _grade_count() == before
+
+
+def test_update_grades_rejects_unknown_chapter(client, class_ids):
+    student = Student.query.filter_by(class_id=class_ids[0]).first()
+    before = _grade_count()
+    response = client.post('/grades', data={'student_id': student.id, 'chapter_id': 999999, 'score': '75'},
+                           follow_redirects=True)
+
+    assert response.status_code == 200
+    assert 'Bab tidak ditemukan' in response.get_data(as_text=True)
+    assert _grade_count() == before
+
+
+def test_grades_batch_reports_saved_rows(client, class_ids):
+    student = Student.query.filter_by(class_id=class_ids[0]).first()
+    response = client.post('/api/grades/batch', json=[
+        {'student_id': student.id, 'chapter_id': 1, 'score': 80},
+        {'student_id': 999999, 'chapter_id': 1, 'score': 80},
+    ])
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['saved'] == 1
+    assert [result['status'] for result in body['results']] == ['updated', 'error']
+
+
+def test_grades_batch_failure_marks_every_row_failed(client, class_ids, monkeypatch):
+    import app as app_module
+
+    def fail(changes):
+        raise RuntimeError("database went away")
+
+    # Fails after the grades were written to the session, before the commit
+    monkeypatch.setattr(app_module, 'commit_grade_changes', fail)
+    students = Student.query.filter_by(class_id=class_ids[0]).limit(2).all()
+    before = {(grade.student_id, grade.chapter_id): grade.score for grade in Grade.query}
+    response = client.post('/api/grades/batch', json=[
+        {'student_id': student.id, 'chapter_id': 1, 'score': 12} for student in students
+    ])
+
+    body = response.get_json()
+    assert response.status_code == 500
+    assert body['saved'] == 0
+    assert all(result['status'] == 'error' for result in body['results'])
+    db.session.expire_all()
+    assert {(grade.student_id, grade.chapter_id): grade.score for grade in Grade.query} == before
+
+
+def test_concurrent_writes_to_one_grade_keep_stats_exact(app, class_ids, monkeypatch):
+    import app as app_module
+
+    grade = Grade.query.first()
+    student_id, chapter_id = grade.student_id, grade.chapter_id
+    db.session.commit()
+    first_read, second_read = threading.Event(), threading.Event()
+    update_stats = app_module.update_class_chapter_stats
+
+    def update_stats_slowly(changes):
+        if first_read.is_set():
+            second_read.set()
+        else:
+            first_read.set()
+            # Leave the other writer time to read the same old score, if it can
+            second_read.wait(1)
+        update_stats(changes)
+
+    monkeypatch.setattr(app_module, 'update_class_chapter_stats', update_stats_slowly)
+
+    def post(score):
+        app.test_client().post('/grades', data={'student_id': student_id, 'chapter_id': chapter_id,
+                                                'score': score})
+
+    writers = [threading.Thread(target=post, args=(score,)) for score in ('10', '95')]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join(10)
+
+    db.session.expire_all()
+    assert check_class_chapter_stats() == []
@@ -0,0 +1,70 @@
+import threading
+
+import numpy as np
+
+import services
+from models import Class
+
+
+def test_model_training_does_not_block_other_callers(app, class_ids, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    previous, trained = object(), object()
+
+    def slow_train(partition=None):
+        started.set()
+        release.wait(10)
+        return trained
+
+    monkeypatch.setattr(services, 'train_recommendation_model', slow_train)
+    monkeypatch.setattr(services, 'save_model_artifact', lambda *args, **kwargs: None)
+    monkeypatch.setattr(services, 'is_retrain_pending', lambda: False)
+    # Keep the stand-in models out of the cache other tests use
+    monkeypatch.setattr(services, '_model_cache', {})
+    with services._model_lock:
+        services._model_cache[None] = {'version': 'stale', 'generation': services._model_key_generation(None),
+                                       'model': previous}
+
+    def train():
+        with app.app_context():
+            services.get_recommendation_model()
+
+    trainer = threading.Thread(target=train)
+    trainer.start()
+    try:
+        assert started.wait(10)
+        # The lock is free and other callers get the previous model meanwhile
+        assert services._model_lock.acquire(timeout=1)
+        services._model_lock.release()
+        assert services.get_recommendation_model() is previous
+    finally:
+        release.set()
+        trainer.join(10)
+
+    assert services.get_recommendation_model() is trained
+
+
+def test_api_recommendations_uses_partitioned_model(client, class_ids, monkeypatch):
+    requested = []
+
+    class Model:
+        def predict(self, features):
+            return np.full(len(features), 'Required', dtype=object)
+
+    def get_model(partition=None):
+        requested.append(partition)
+        return Model()
+
+    monkeypatch.setattr(services, 'MODEL_PARTITION', 'year')
+    monkeypatch.setattr(services, 'get_recommendation_model', get_model)
+    year_id = services.db.session.get(Class, class_ids[0]).academic_year_id
+
+    response = client.get(f'/api/recommendations?class_id={class_ids[0]}')
+
+    assert response.status_code == 200
+    assert requested == [f'year-{year_id}']
+
+
+def test_api_recommendations_rejects_bad_class_id(client, class_ids):
+    response = client.get('/api/recommendations?class_id=abc')
+
+    assert response.status_code == 400
@@ -0,0 +1,17 @@
+from models import db, Class, Student
+
+
+def test_performance_data_of_a_class_without_grades(client, class_ids):
+    year_id = db.session.get(Class, class_ids[0]).academic_year_id
+    class_obj = Class(name='Kelas Baru', academic_year_id=year_id)
+    db.session.add(class_obj)
+    db.session.flush()
+    db.session.add(Student(name='Siswa Baru', class_id=class_obj.id))
+    db.session.commit()
+
+    response = client.get(f'/api/performance_data?class_id={class_obj.id}')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['average_scores'] == [None] * len(data['chapter_ids'])
+    assert data['performance_categories']['no_data'] == 100
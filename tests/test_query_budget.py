@@ -0,0 +1,11 @@
+from benchmarks.query_budget import SIZES, budget_problems, measure
+from benchmarks.run import wait_for_background_work
+
+
+def test_routes_stay_within_their_query_budget():
+    runs = [(size, measure(*size)) for size in SIZES]
+    # /model-accuracy starts an evaluation in the background
+    wait_for_background_work()
+
+    problems = {endpoint: found for endpoint, found in budget_problems(runs).items() if found}
+    assert problems == {}
@@ -1,85 +1,117 @@
 import numpy as np
-from models import Grade, Student, Chapter
+import pandas as pd
+from sqlalchemy import case, func
+from models import db, AcademicYear, Class, Grade, Student, Chapter, ClassChapterStats
+from instrumentation import timed
+from grade_matrix import get_grade_matrix
 
+# Levels accepted by get_aggregate_performance and the percentiles it reports
+AGGREGATE_LEVELS = ('class', 'year', 'school')
+AGGREGATE_PERCENTILES = (25, 50, 75, 90)
+
+# Category buckets on the 0-1 scale, same thresholds as prepare_performance_data
+CATEGORY_BUCKETS = (
+    ('special_class', Grade.score >= 0.9),
+    ('unnecessary', (Grade.score >= 0.8) & (Grade.score < 0.9)),
+    ('required', (Grade.score >= 0.7) & (Grade.score < 0.8)),
+    ('very_necessary', Grade.score < 0.7)
+)
+
+@timed
+def load_score_frame(students, chapters):
+    """
+    Load grades for the given students as a student x chapter DataFrame
+    
+    Sliced from the grade matrix, so no grade rows are read from the
+    database. Missing grades are NaN.
+    
+    Returns:
+        pd.DataFrame: Scores indexed by student id with one column per chapter id
+    """
+    student_ids = [student.id for student in students]
+    chapter_ids = [chapter.id for chapter in chapters]
+    return pd.DataFrame(get_grade_matrix().scores_for(student_ids, chapter_ids),
+                        index=pd.Index(student_ids, name='student_id'),
+                        columns=pd.Index(chapter_ids, name='chapter_id'))
+
+def _to_nullable_list(values):
+    """Convert an array with NaN for missing values into a JSON-friendly list"""
+    return [None if np.isnan(value) else float(value) for value in values]
+
+@timed
+def load_class_chapter_stats(class_ids, chapter_ids):
+    """
+    Load the materialized ClassChapterStats of some classes, summed per chapter
+    
+    Returns:
+        pd.DataFrame: grade_count, score_sum and bucket counts indexed by chapter id
+    """
+    columns = ['grade_count', 'score_sum', 'special_class', 'unnecessary', 'required', 'very_necessary']
+    rows = []
+    if class_ids and chapter_ids:
+        rows = db.session.query(
+            ClassChapterStats.chapter_id, *[getattr(ClassChapterStats, column) for column in columns]
+        ).filter(ClassChapterStats.class_id.in_(class_ids)).all()
+    
+    stats = pd.DataFrame(rows, columns=['chapter_id'] + columns)
+    # Without rows the columns would be object dtype, and score_sum / grade_count Python division
+    dtypes = dict.fromkeys(columns, 'int64')
+    dtypes['score_sum'] = 'float64'
+    return stats.groupby('chapter_id').sum().reindex(chapter_ids, fill_value=0).astype(dtypes)
+
+@timed
 def prepare_performance_data(students, chapters):
     """
     Prepare performance data for visualization
     
+    Averages and the category distribution come from ClassChapterStats (one
+    row per class and chapter), so students must cover whole classes. The
+    per-student scores for the heatmap are still read from the grades.
+    
     Returns:
         dict: A dictionary containing performance data for visualization
     """
-    result = {
-        'chapter_names': [chapter.name for chapter in chapters],
-        'chapter_ids': [chapter.id for chapter in chapters],
-        'student_data': [],
-        'average_scores': [],
-        'performance_categories': {
-            'special_class': 0,
-            'unnecessary': 0,
-            'required': 0,
-            'very_necessary': 0,
-            'no_data': 0
-        }
-    }
+    scores = load_score_frame(students, chapters)
+    values = scores.to_numpy()
+    stats = load_class_chapter_stats({student.class_id for student in students},
+                                     [chapter.id for chapter in chapters])
     
-    # Initialize average scores array
-    for _ in chapters:
-        result['average_scores'].append([])
-    
-    # Process each student
-    for student in students:
-        student_grades = {}
-        grades = Grade.query.filter_by(student_id=student.id).all()
-        
-        for grade in grades:
-            student_grades[grade.chapter_id] = grade.score
-        
-        # Create student data entry
-        student_data = {
-            'id': student.id,
-            'name': student.name,
-            'scores': []
-        }
-        
-        # Fill in scores for each chapter
-        for i, chapter in enumerate(chapters):
-            if chapter.id in student_grades:
-                score = student_grades[chapter.id]
-                student_data['scores'].append(score)
-                result['average_scores'][i].append(score)
-                
-                # Update performance categories count - use 0-1 scale thresholds
-                if score >= 0.9:
-                    result['performance_categories']['special_class'] += 1
-                elif score >= 0.8:
-                    result['performance_categories']['unnecessary'] += 1
-                elif score >= 0.7:
-                    result['performance_categories']['required'] += 1
-                else:
-                    result['performance_categories']['very_necessary'] += 1
-            else:
-                student_data['scores'].append(None)
-                result['performance_categories']['no_data'] += 1
-        
-        result['student_data'].append(student_data)
+    # Per-chapter averages over the students that have a grade
+    counts = stats['grade_count'].to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        averages = pd.Series(np.where(counts > 0, stats['score_sum'].to_numpy() / counts, np.nan)).round(2)
     
-    # Calculate final averages
-    for i in range(len(chapters)):
-        if result['average_scores'][i]:
-            result['average_scores'][i] = round(np.mean(result['average_scores'][i]), 2)
-        else:
-            result['average_scores'][i] = None
+    # Count grades in each category - use 0-1 scale thresholds
+    categories = {
+        'special_class': int(stats['special_class'].sum()),
+        'unnecessary': int(stats['unnecessary'].sum()),
+        'required': int(stats['required'].sum()),
+        'very_necessary': int(stats['very_necessary'].sum()),
+        'no_data': int(values.size - counts.sum())
+    }
     
     # Calculate performance distribution
-    total = sum(result['performance_categories'].values())
+    total = sum(categories.values())
     if total > 0:
-        for category in result['performance_categories']:
-            result['performance_categories'][category] = round(
-                (result['performance_categories'][category] / total) * 100, 2
-            )
+        for category in categories:
+            categories[category] = round((categories[category] / total) * 100, 2)
     
-    return result
+    return {
+        'chapter_names': [chapter.name for chapter in chapters],
+        'chapter_ids': [chapter.id for chapter in chapters],
+        'student_data': [
+            {
+                'id': student.id,
+                'name': student.name,
+                'scores': _to_nullable_list(row)
+            }
+            for student, row in zip(students, values)
+        ],
+        'average_scores': _to_nullable_list(averages.to_numpy()),
+        'performance_categories': categories
+    }
 
+@timed
 def get_student_grade_heatmap_data(class_id):
     """
     Get heatmap data for grades in a specific class
@@ -93,31 +125,13 @@ def get_student_grade_heatmap_data(class_id):
     students = Student.query.filter_by(class_id=class_id).all()
     chapters = Chapter.query.all()
     
-    # Create matrix
-    heatmap_data = {
+    scores = load_score_frame(students, chapters)
+    
+    return {
         'students': [student.name for student in students],
         'chapters': [chapter.name for chapter in chapters],
-        'data': []
+        'data': [_to_nullable_list(row) for row in scores.to_numpy()]
     }
-    
-    # Fill in data
-    for student in students:
-        student_grades = {}
-        grades = Grade.query.filter_by(student_id=student.id).all()
-        
-        for grade in grades:
-            student_grades[grade.chapter_id] = grade.score
-        
-        student_row = []
-        for chapter in chapters:
-            if chapter.id in student_grades:
-                student_row.append(student_grades[chapter.id])
-            else:
-                student_row.append(None)
-        
-        heatmap_data['data'].append(student_row)
-    
-    return heatmap_data
 
 def get_dependency_graph_data():
     """
@@ -151,3 +165,158 @@ def get_dependency_graph_data():
         })
     
     return graph_data
+
+def _aggregate_groups(level):
+    """Group key column and (id, name) columns for an aggregation level"""
+    if level == 'class':
+        return Class.id, (Class.id, Class.name)
+    if level == 'year':
+        return Class.academic_year_id, (AcademicYear.id, AcademicYear.name)
+    return None, ()
+
+def _scoped(query, academic_year_id):
+    """Join a Student query to its class and optionally limit it to one academic year"""
+    query = query.join(Class, Class.id == Student.class_id)
+    if academic_year_id is not None:
+        query = query.filter(Class.academic_year_id == academic_year_id)
+    return query
+
+def _matrix_percentiles(level, academic_year_id):
+    """AGGREGATE_PERCENTILES per (group, chapter) from the grade matrix
+
+    Same linear interpolation as percentile_cont. Chapters without grades
+    in a group are left out.
+    """
+    classes = db.session.query(Class.id, Class.academic_year_id)
+    if academic_year_id is not None:
+        classes = classes.filter(Class.academic_year_id == academic_year_id)
+    group_classes = {}
+    for class_id, year_id in classes:
+        group_id = class_id if level == 'class' else year_id if level == 'year' else 0
+        group_classes.setdefault(group_id, []).append(class_id)
+
+    matrix = get_grade_matrix()
+    rows = []
+    for group_id, class_ids in group_classes.items():
+        values = matrix.values(matrix.class_rows(class_ids))
+        graded = np.flatnonzero((~np.isnan(values)).any(axis=0))
+        if not len(graded):
+            continue
+        percentiles = np.nanpercentile(values[:, graded], AGGREGATE_PERCENTILES, axis=0)
+        rows.extend([group_id, int(matrix.chapter_ids[j])] + list(percentiles[:, k]) for k, j in enumerate(graded))
+    return pd.DataFrame(rows, columns=['group_id', 'chapter_id'] + [f'p{p}' for p in AGGREGATE_PERCENTILES])
+
+@timed
+def get_aggregate_performance(level='year', academic_year_id=None):
+    """
+    Get per-chapter statistics and category distributions per class, per academic year or school-wide
+    
+    Counts, mean, min, max and category buckets are computed with one GROUP BY
+    query. Percentiles use percentile_cont on PostgreSQL; on other databases
+    numpy computes them from the grade matrix with the same linear
+    interpolation.
+    
+    Args:
+        level: 'class', 'year' or 'school'
+        academic_year_id: Optional academic year limiting the classes included
+        
+    Returns:
+        dict: Chapters plus one entry per group with its student count,
+            category distribution and per-chapter statistics
+    """
+    group_key, group_columns = _aggregate_groups(level)
+    keys = [group_key.label('group_id')] if group_key is not None else []
+    postgres = db.engine.dialect.name == 'postgresql'
+    
+    # One row per (group, chapter)
+    columns = keys + [
+        Grade.chapter_id,
+        func.count(Grade.score).label('count'),
+        func.avg(Grade.score).label('mean'),
+        func.min(Grade.score).label('min'),
+        func.max(Grade.score).label('max')
+    ] + [func.sum(case((condition, 1), else_=0)).label(name) for name, condition in CATEGORY_BUCKETS]
+    if postgres:
+        columns += [
+            func.percentile_cont(p / 100.0).within_group(Grade.score).label(f'p{p}')
+            for p in AGGREGATE_PERCENTILES
+        ]
+    query = _scoped(db.session.query(*columns).select_from(Grade).join(Student, Student.id == Grade.student_id),
+                    academic_year_id)
+    stats = pd.DataFrame(
+        query.group_by(*keys, Grade.chapter_id).all(),
+        columns=['group_id', 'chapter_id'][1 - len(keys):] + [column.name for column in columns[len(keys) + 1:]]
+    )
+    if not keys:
+        stats['group_id'] = 0
+    
+    if not postgres and not stats.empty:
+        stats = stats.merge(_matrix_percentiles(level, academic_year_id), on=['group_id', 'chapter_id'], how='left')
+    
+    # Student count (and name) of every group, including groups without grades
+    query = _scoped(db.session.query(*group_columns, func.count(Student.id)).select_from(Student), academic_year_id)
+    if level == 'year':
+        query = query.join(AcademicYear, AcademicYear.id == Class.academic_year_id)
+    if group_columns:
+        groups = query.group_by(*group_columns).order_by(group_columns[0]).all()
+    else:
+        groups = [(0, 'Seluruh Sekolah', query.scalar())]
+    
+    chapters = db.session.query(Chapter.id, Chapter.name).order_by(Chapter.id).all()
+    bucket_names = [name for name, _ in CATEGORY_BUCKETS]
+    stats_by_group = {group_id: frame for group_id, frame in stats.groupby('group_id')}
+    
+    results = []
+    for group_id, name, student_count in groups:
+        group_stats = stats_by_group.get(group_id, stats.iloc[0:0]).set_index('chapter_id')
+        chapter_stats = []
+        for chapter_id, _ in chapters:
+            if chapter_id in group_stats.index:
+                row = group_stats.loc[chapter_id]
+                count = int(row['count'])
+                chapter_stats.append({
+                    'chapter_id': chapter_id,
+                    'count': count,
+                    'mean': float(row['mean']),
+                    'min': float(row['min']),
+                    'max': float(row['max']),
+                    'percentiles': {f'p{p}': float(row[f'p{p}']) for p in AGGREGATE_PERCENTILES},
+                    'categories': dict({bucket: int(row[bucket]) for bucket in bucket_names},
+                                       no_data=max(student_count - count, 0))
+                })
+            else:
+                chapter_stats.append({
+                    'chapter_id': chapter_id,
+                    'count': 0,
+                    'mean': None,
+                    'min': None,
+                    'max': None,
+                    'percentiles': {f'p{p}': None for p in AGGREGATE_PERCENTILES},
+                    'categories': dict({bucket: 0 for bucket in bucket_names}, no_data=student_count)
+                })
+        
+        # Distribution over every student x chapter cell, as in prepare_performance_data
+        category_counts = {
+            bucket: sum(chapter['categories'][bucket] for chapter in chapter_stats)
+            for bucket in bucket_names + ['no_data']
+        }
+        total = sum(category_counts.values())
+        results.append({
+            'id': int(group_id),
+            'name': name,
+            'student_count': int(student_count),
+            'category_counts': category_counts,
+            'performance_categories': {
+                bucket: round((count / total) * 100, 2) if total > 0 else 0
+                for bucket, count in category_counts.items()
+            },
+            'chapters': chapter_stats
+        })
+    
+    return {
+        'level': level,
+        'academic_year_id': academic_year_id,
+        'percentiles': list(AGGREGATE_PERCENTILES),
+        'chapters': [{'id': chapter_id, 'name': name} for chapter_id, name in chapters],
+        'groups': results
+    }